@@ -0,0 +1,132 @@
+import numpy as np
+from functools import lru_cache
+
+# direction vectors (row, col) in the order sequences are reported by C4State.find_sequence
+DIRECTIONS = {"horizontal": (0, +1), "vertical": (+1, 0), "diag": (+1, +1), "antidiag": (+1, -1)}
+
+class Geometry(object):
+    """
+    Line geometry of a board shape for sequences of a given length, computed once per shape.
+
+    Every cell is a flat index (row * cols + col) into board.ravel().
+    Index arrays pointing to something that falls off the board hold -1, so lookups
+    can be done on arrays padded with a trailing False/0 (see pad).
+
+    Attributes:
+    windows (np.array): (W, length) cells of every window, grouped by direction, starts in row-major order.
+    starts, ends (np.array): (W, 2) coordinates of the first and last cell of each window.
+    direction_slices (dict): Direction name to the slice of its windows.
+    next_window, prev_window (np.array): (W,) window shifted by +d / -d in the same direction.
+    before, after (np.array): (W,) cell preceding the start / following the end of each window.
+    back_rays, forward_rays (np.array): (W, max(rows, cols)) cells from the window start going -d /
+                                        from the window end going +d, both included.
+    cell_windows (list): Windows passing through each cell.
+    cell_windows_padded (np.array): (rows*cols, max windows per cell) version of cell_windows.
+    neighbors (np.array): (rows*cols, 4, 2) cell at -d and +d of every cell for each direction.
+    """
+
+    def __init__(self, rows: int, cols: int, length: int):
+        self.rows = rows
+        self.cols = cols
+        self.length = length
+
+        windows, starts, ends, shifts = [], [], [], []
+        self.direction_slices = {}
+        for direction, (dx, dy) in DIRECTIONS.items():
+            first = len(windows)
+            for row in range(rows):
+                for col in range(cols):
+                    end_row, end_col = row + (length - 1) * dx, col + (length - 1) * dy
+                    if not (self.on_board(row, col) and self.on_board(end_row, end_col)):
+                        continue
+                    windows.append([(row + i * dx) * cols + col + i * dy for i in range(length)])
+                    starts.append((row, col))
+                    ends.append((end_row, end_col))
+                    shifts.append((dx, dy))
+            self.direction_slices[direction] = slice(first, len(windows))
+
+        self.windows = np.array(windows, dtype=np.int64).reshape(-1, length)
+        self.starts = np.array(starts, dtype=np.int64).reshape(-1, 2)
+        self.ends = np.array(ends, dtype=np.int64).reshape(-1, 2)
+
+        index = {(tuple(s), d): i for i, (s, d) in enumerate(zip(starts, shifts))}
+        span = max(rows, cols)
+        n_windows = len(windows)
+
+        self.next_window = np.full(n_windows, -1, dtype=np.int64)
+        self.prev_window = np.full(n_windows, -1, dtype=np.int64)
+        self.before = np.full(n_windows, -1, dtype=np.int64)
+        self.after = np.full(n_windows, -1, dtype=np.int64)
+        self.back_rays = np.full((n_windows, span), -1, dtype=np.int64)
+        self.forward_rays = np.full((n_windows, span), -1, dtype=np.int64)
+
+        for i, ((row, col), (end_row, end_col), (dx, dy)) in enumerate(zip(starts, ends, shifts)):
+            self.next_window[i] = index.get(((row + dx, col + dy), (dx, dy)), -1)
+            self.prev_window[i] = index.get(((row - dx, col - dy), (dx, dy)), -1)
+            self.before[i] = self.flat(row - dx, col - dy)
+            self.after[i] = self.flat(end_row + dx, end_col + dy)
+            for p in range(span):
+                self.back_rays[i, p] = self.flat(row - p * dx, col - p * dy)
+                self.forward_rays[i, p] = self.flat(end_row + p * dx, end_col + p * dy)
+
+        self.cell_windows = [[] for _ in range(rows * cols)]
+        for i, cells in enumerate(windows):
+            for cell in cells:
+                self.cell_windows[cell].append(i)
+        self.cell_windows = [np.array(w, dtype=np.int64) for w in self.cell_windows]
+
+        max_per_cell = max(len(w) for w in self.cell_windows)
+        self.cell_windows_padded = np.full((rows * cols, max_per_cell), -1, dtype=np.int64)
+        for cell, w in enumerate(self.cell_windows):
+            self.cell_windows_padded[cell, :len(w)] = w
+
+        self.neighbors = np.full((rows * cols, len(DIRECTIONS), 2), -1, dtype=np.int64)
+        for row in range(rows):
+            for col in range(cols):
+                for d, (dx, dy) in enumerate(DIRECTIONS.values()):
+                    self.neighbors[row * cols + col, d] = (self.flat(row - dx, col - dy), self.flat(row + dx, col + dy))
+
+    def on_board(self, row, col):
+        return row >= 0 and row < self.rows and col >= 0 and col < self.cols
+
+    def flat(self, row, col):
+        """
+        Flat index of a cell, -1 if it is off the board.
+        """
+        return row * self.cols + col if self.on_board(row, col) else -1
+
+    def matches(self, board: np.array, player: int):
+        """
+        (W,) mask of the windows fully occupied by player.
+        """
+        return (board.ravel()[self.windows] == player).all(axis=1)
+
+    def pure_matches(self, board: np.array, player: int):
+        """
+        (W,) mask of the windows fully occupied by player that are not part of a longer sequence.
+        """
+        matches = pad(self.matches(board, player))
+        return matches[:-1] & ~matches[self.next_window] & ~matches[self.prev_window]
+
+def pad(array: np.array, value=False):
+    """
+    Appends a trailing value so that index arrays holding -1 (off the board) read it.
+    """
+    return np.append(array, np.array([value], dtype=array.dtype))
+
+@lru_cache(maxsize=None)
+def get_geometry(rows: int, cols: int, length: int):
+    """
+    Geometry tables of a board shape, built once and cached.
+    """
+    return Geometry(rows, cols, length)
+
+@lru_cache(maxsize=None)
+def zobrist_table(rows: int, cols: int):
+    """
+    Random 64-bit keys for every (player, cell) pair of a board shape.
+    Seeded by the shape so that hashes are stable across processes and runs.
+    """
+    rng = np.random.default_rng(rows * 1000 + cols)
+    keys = rng.integers(1, 2**63, size=(2, rows * cols), dtype=np.int64)
+    return keys.tolist()
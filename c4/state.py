@@ -1,5 +1,5 @@
 import numpy as np
-from scipy.signal import convolve2d
+from c4.geometry import DIRECTIONS, get_geometry, zobrist_table
 
 class C4State(object):
     """
@@ -25,38 +25,53 @@ class C4State(object):
         self.last_player = 2      # p1 will start
         self.last_move = None
         self.winner = 0         # 0: no winner, 1: p1 wins, 2: p2 wins
+        self.hash = 0           # zobrist hash of the board (side to move follows from the chip count)
 
         self.board = np.zeros((self.rows, self.cols), dtype=int)
+        self.heights = [0] * self.cols     # chips in each column
 
-        self.directions = {"horizontal": (0, +1), "diag": (+1, +1), "vertical": (+1, 0), "antidiag": (+1, -1)}
+        # chips of each player in each winning window, and windows still free of opponent chips
+        self.window_counts = np.zeros((2, len(self.geometry.windows)), dtype=np.int8)
+        self.open_windows = [len(self.geometry.windows)] * 2
+
+        self.directions = DIRECTIONS
+
+    @property
+    def geometry(self):
+        """
+        Winning windows of this board shape (shared by every state of the same shape).
+        """
+        return get_geometry(self.rows, self.cols, self.connect)
 
     def make_move(self, movecol: int):
         """ 
         Changes state by "dropping" a chip in the specified column
         """
-        assert movecol >= 0 and movecol <= self.cols and self.board[0][movecol] == 0
-        row = 0
-        while row < self.rows and self.board[row][movecol] == 0:
-            row += 1
-        row -= 1 
+        assert movecol >= 0 and movecol < self.cols and self.heights[movecol] < self.rows
+        row = self.rows - 1 - self.heights[movecol]
+        self.heights[movecol] += 1
 
         self.last_move = movecol
         self.last_player = 3 - self.last_player
-        self.board[row][movecol] = self.last_player
+        self.board[row, movecol] = self.last_player
+        self.hash ^= zobrist_table(self.rows, self.cols)[self.last_player-1][row*self.cols + movecol]
+        self.update_windows(row*self.cols + movecol, self.last_player, 1)
         self.update_winner(row, movecol)
     
     def undo_move(self, movecol: int):
         """
         Undo last move by removing topmost chip on column specified.
         """
-        row = 0
-        while row < self.rows and self.board[row][movecol] == 0:
-            row += 1
-        if row == self.rows:  # no chip
+        if self.heights[movecol] == 0:  # no chip
             raise ValueError("Cannot undo move in an empty column.")
+        row = self.rows - self.heights[movecol]
+        self.heights[movecol] -= 1
         
         # remove chip
-        self.board[row][movecol] = 0
+        player = self.board[row, movecol]
+        self.hash ^= zobrist_table(self.rows, self.cols)[player-1][row*self.cols + movecol]
+        self.update_windows(row*self.cols + movecol, player, -1)
+        self.board[row, movecol] = 0
         self.last_player = 3 - self.last_player  # revert to the previous player's turn
         self.winner = 0  # reset winner
     
@@ -67,7 +82,7 @@ class C4State(object):
         """
         if self.winner != 0:
             return []
-        return [col for col in range(self.cols) if self.board[0][col] == 0]
+        return [col for col in range(self.cols) if self.heights[col] < self.rows]
 
     def available_immediately(self, row, col):
         """
@@ -81,94 +96,80 @@ class C4State(object):
     def on_board(self, row, col):
         return row >= 0 and row < self.rows and col >= 0 and col < self.cols
 
+    def available_mask(self):
+        """
+        Flat (rows*cols + 1,) mask of the cells where available_immediately holds.
+        The trailing False is read by off-board (-1) entries of the geometry tables.
+        """
+        available = self.board == 0
+        available[1:] &= self.board[:-1] != 0
+        return np.append(available.ravel(), False)
+
+    def update_windows(self, cell: int, player: int, delta: int):
+        """
+        Adds (delta=1) or removes (delta=-1) a chip of player in the window counts.
+        Windows through the cell without chips of player are opened or closed for the opponent.
+        """
+        windows = self.geometry.cell_windows[cell]
+        counts = self.window_counts[player-1]
+        if delta > 0:
+            self.open_windows[2-player] -= int(np.count_nonzero(counts[windows] == 0))
+            counts[windows] += 1
+        else:
+            counts[windows] -= 1
+            self.open_windows[2-player] += int(np.count_nonzero(counts[windows] == 0))
+
+    def is_dead_draw(self):
+        """
+        True if nobody has won and no winning window is still open to either player,
+        i.e. the game can only end in a draw, however many moves are left.
+        """
+        return self.winner == 0 and self.open_windows[0] == 0 and self.open_windows[1] == 0
+
+    def winning_moves(self, player: int):
+        """
+        Columns where player would win immediately by dropping a chip,
+        i.e. whose landing cell completes a window holding connect-1 chips of player and none of the opponent.
+        """
+        geometry = self.geometry
+        own = self.window_counts[player-1]
+        other = self.window_counts[2-player]
+        moves = []
+        for col in range(self.cols):
+            if self.heights[col] == self.rows:
+                continue
+            windows = geometry.cell_windows[(self.rows - 1 - self.heights[col])*self.cols + col]
+            if ((own[windows] == self.connect - 1) & (other[windows] == 0)).any():
+                moves.append(col)
+        return moves
+
     def update_winner(self, row, col):
         """ 
         Checks if last turn player just won the game. 
-        Accepts last moves coordinates for a faster lookup.
-        
-        Parameters:
-        player (int): Player to check for (optional)
-        
-        Returns:
-        bool: True if last turn player won the game, False otherwise
+        Only the winning windows through the last move are inspected.
         """
         player = self.last_player
-        for (dx, dy) in self.directions.values():
-            p = 1
-            while self.on_board(row+p*dx, col+p*dy) and self.board[row+p*dx][col+p*dy] == player:
-                p += 1
-            n = 1
-            while self.on_board(row-n*dx, col-n*dy) and self.board[row-n*dx][col-n*dy] == player:
-                n += 1
-            if p + n >= (self.connect + 1):
-                self.winner = player
-                return
-        return 
+        windows = self.geometry.windows[self.geometry.cell_windows[row*self.cols + col]]
+        if (self.board.ravel()[windows] == player).all(axis=1).any():
+            self.winner = player
     
     def find_sequence(self, length, player):
         """
         Finds sequences of given length on all directions.
-        """
-        board = (self.board == player)  # binary mask for the last player's chips
-
-        kernel = np.ones((1, length), dtype=int)
-        diag_kernel = np.eye(length, dtype=int)
-        
-        result_dict = {}
-        result_dict["horizontal"] = self.find_direction(board, length, kernel, "horizontal")
-        result_dict["vertical"] = self.find_direction(board, length, kernel.T, "vertical")
-        result_dict["diag"] = self.find_direction(board, length, diag_kernel, "diag")
-        result_dict["antidiag"] = self.find_direction(board, length, np.fliplr(diag_kernel), "antidiag")
-
-        return result_dict
-
-    def find_direction(self, board, length, kernel, direction):
-        """
-        Helper function for find_sequence.
-        Finds sequences of specified length in a given direction.
-
-        Parameters:
-        board (np.array): Binary array.
-        length (int): Sequence length.
-        kernel (np.array): Direction kernel for convolution.
+        Sequences that are part of a longer one are ignored.
 
         Returns:
-        sequences (list): List of coordinate (start, end) pairs for each match.
+        dict: Direction to list of coordinate (start, end) pairs for each match.
         """
+        geometry = get_geometry(self.rows, self.cols, length)
+        pure = geometry.pure_matches(self.board, player)
 
-        def within_bounds(row, col, rows, cols):
-            return row >= 0 and row < rows and col >= 0 and col < cols
-
-        conv = convolve2d(board, kernel, mode="valid")  # 2D convolution
-        bool_conv = conv == length              
-        match_indices = np.argwhere(bool_conv)  # matches for the sequence length
-    
-        sequences = []
-        for idx in match_indices:
-            
-            start_row, start_col = idx
-
-            # checking if sequence belongs to a bigger sequence
-            is_pure = True
-            dx, dy = self.directions[direction]
-            if within_bounds(start_row+dx, start_col+dy, bool_conv.shape[0], bool_conv.shape[1]) and bool_conv[start_row+dx][start_col+dy] or \
-                within_bounds(start_row-dx, start_col-dy, bool_conv.shape[0], bool_conv.shape[1]) and bool_conv[start_row-dx][start_col-dy]:
-                is_pure = False
-            
-            # if it does, ignore it
-            if not is_pure:
-                continue
-
-            end_row = start_row + kernel.shape[0] - 1
-            end_col = start_col + kernel.shape[1] - 1
-
-            # due to convolution, antidiag cols are inversed
-            if direction == "antidiag":
-                start_col, end_col = end_col, start_col
+        result_dict = {}
+        for direction, window_slice in geometry.direction_slices.items():
+            match_indices = np.nonzero(pure[window_slice])[0] + window_slice.start
+            result_dict[direction] = [(tuple(geometry.starts[i]), tuple(geometry.ends[i])) for i in match_indices]
 
-            sequences.append(((start_row, start_col), (end_row, end_col)))
-        
-        return sequences
+        return result_dict
 
     def copy(self):
         """ 
@@ -177,5 +178,10 @@ class C4State(object):
         copy = C4State(rows=self.rows, cols=self.cols, connect=self.connect)
         copy.last_player = self.last_player
         copy.winner = self.winner
+        copy.hash = self.hash
+        copy.last_move = self.last_move
         copy.board = self.board.copy()
+        copy.heights = self.heights.copy()
+        copy.window_counts = self.window_counts.copy()
+        copy.open_windows = self.open_windows.copy()
         return copy
@@ -0,0 +1,151 @@
+import numpy as np
+from c4.state import C4State
+from c4.geometry import get_geometry
+
+class VecC4State(object):
+    """
+    N Connect X games of the same shape stepped together.
+
+    Boards are stored in a single (n, rows, cols) array using the same conventions as C4State:
+        - row 0 is the top of the board (chips fall towards the last row)
+        - 0: no chip, 1: p1 chip, 2: p2 chip
+    Finished games ignore the moves given to them. With autoreset, they are reset
+    at the beginning of the next step (so their final board and winner can still be read).
+    """
+
+    def __init__(self,
+                 n: int,
+                 rows: int=7,
+                 cols: int=6,
+                 connect: int=4,
+                 autoreset: bool=False
+                 ):
+        self.n = n
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.autoreset = autoreset
+
+        self.boards = np.zeros((n, rows, cols), dtype=np.int8)
+        self.heights = np.zeros((n, cols), dtype=np.int64)           # chips per column
+        self.last_player = np.full(n, 2, dtype=np.int8)             # p1 will start
+        self.winner = np.zeros(n, dtype=np.int8)                    # 0: no winner, 1: p1 wins, 2: p2 wins
+        self.n_moves = np.zeros(n, dtype=np.int64)
+        self.history = np.full((n, rows * cols), -1, dtype=np.int8)  # moves played by each game (for undo)
+
+    def done(self):
+        """
+        Boolean mask of finished games (won or full board).
+        """
+        return (self.winner != 0) | (self.n_moves == self.rows * self.cols)
+
+    def legal_mask(self):
+        """
+        (n, cols) boolean mask of playable columns. All False for finished games.
+        """
+        return (self.heights < self.rows) & ~self.done()[:, None]
+
+    def winners(self):
+        return self.winner.copy()
+
+    def step(self, moves):
+        """
+        Drops a chip on the given column of every game.
+
+        Parameters:
+        moves (array-like): One column per game, -1 to leave a game untouched. Ignored for finished games.
+
+        Returns:
+        (np.array, np.array): Winners and finished-games mask after the move.
+        """
+        if self.autoreset:
+            self.reset()
+
+        moves = np.asarray(moves, dtype=np.int64)
+        idx = np.nonzero((moves >= 0) & ~self.done())[0]
+        cols = moves[idx]
+
+        if np.any(cols >= self.cols) or np.any(self.heights[idx, cols] >= self.rows):
+            raise ValueError("Illegal move: column out of bounds or full.")
+
+        rows = self.rows - 1 - self.heights[idx, cols]
+        players = (3 - self.last_player[idx]).astype(np.int8)
+
+        self.boards[idx, rows, cols] = players
+        self.heights[idx, cols] += 1
+        self.last_player[idx] = players
+        self.history[idx, self.n_moves[idx]] = cols
+        self.n_moves[idx] += 1
+
+        won = self.check_winner(idx, rows, cols, players)
+        self.winner[idx[won]] = players[won]
+
+        return self.winners(), self.done()
+
+    def check_winner(self, idx, rows, cols, players):
+        """
+        Vectorised C4State.update_winner: checks the winning windows through the chips just placed.
+        """
+        geometry = get_geometry(self.rows, self.cols, self.connect)
+        windows = geometry.cell_windows_padded[rows * self.cols + cols]     # (k, max windows per cell), -1 padded
+        cells = geometry.windows[windows]                                   # (k, max windows per cell, connect)
+        boards = self.boards.reshape(self.n, -1)
+        complete = (boards[idx[:, None, None], cells] == players[:, None, None]).all(axis=2)
+        return (complete & (windows >= 0)).any(axis=1)
+
+    def undo(self, mask=None):
+        """
+        Undoes the last move of the selected games (all games by default).
+        Games without moves are left untouched.
+        """
+        mask = np.ones(self.n, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        idx = np.nonzero(mask & (self.n_moves > 0))[0]
+
+        self.n_moves[idx] -= 1
+        cols = self.history[idx, self.n_moves[idx]].astype(np.int64)
+        self.history[idx, self.n_moves[idx]] = -1
+        rows = self.rows - self.heights[idx, cols]
+
+        self.boards[idx, rows, cols] = 0
+        self.heights[idx, cols] -= 1
+        self.last_player[idx] = 3 - self.last_player[idx]
+        self.winner[idx] = 0
+
+    def reset(self, done_mask=None):
+        """
+        Resets the selected games to an empty board (finished games by default).
+        """
+        mask = self.done() if done_mask is None else np.asarray(done_mask, dtype=bool)
+        self.boards[mask] = 0
+        self.heights[mask] = 0
+        self.last_player[mask] = 2
+        self.winner[mask] = 0
+        self.n_moves[mask] = 0
+        self.history[mask] = -1
+
+    def random_moves(self, rng: np.random.Generator):
+        """
+        Uniformly random legal move for every game (-1 for finished games).
+        """
+        legal = self.legal_mask()
+        scores = np.where(legal, rng.random((self.n, self.cols)), -1.0)
+        moves = np.argmax(scores, axis=1)
+        moves[~legal.any(axis=1)] = -1
+        return moves
+
+    def play_random(self, rng: np.random.Generator):
+        """
+        Plays every unfinished game to the end with random moves.
+        """
+        while not self.done().all():
+            self.step(self.random_moves(rng))
+        return self.winners()
+
+    def to_state(self, i: int):
+        """
+        Single C4State of game i, rebuilt by replaying its moves.
+        """
+        state = C4State(rows=self.rows, cols=self.cols, connect=self.connect)
+        for move in self.history[i, :self.n_moves[i]]:
+            state.make_move(int(move))
+        return state
@@ -1,56 +1,109 @@
+import os
+import time
+import numpy as np
 import pygame
 from c4.state import C4State
 
+# chip colors: p1 red, p2 yellow
+COLORS = {1: (255, 0, 0), 2: (255, 255, 0)}
+
 class C4Visual:
     """
     Helper class to display a Connect 4 game state.
+
+    The empty board is drawn once; render then only redraws the cells whose chip changed
+    since the last frame, and updates just those parts of the window.
+    With headless, frames are drawn offscreen (SDL dummy driver), e.g. to capture recorded games.
     """
 
-    def __init__(self, 
+    def __init__(self,
                  state: C4State,
                  cell_rad: float=50,
                  margin: float=20,
-                 empty_color=(0,0,0)
+                 empty_color=(0,0,0),
+                 headless: bool=False
                  ):
-        
+
         self.state = state
         self.cell_rad = cell_rad
         self.margin = margin
         self.empty_color = empty_color
+        self.headless = headless
 
         # board dimensions
         self.cols = self.state.cols
         self.rows = self.state.rows
-        
+
         # width and height of pygame window
         self.w = margin + (self.cols * (cell_rad*2 + margin))
         self.h = margin + (self.rows * (cell_rad*2 + margin))
-        
+
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
         pygame.init()
-        self.screen = pygame.display.set_mode((self.w, self.h))
-        pygame.display.set_caption("C4")
+        if headless:
+            self.screen = pygame.Surface((self.w, self.h))
+        else:
+            self.screen = pygame.display.set_mode((self.w, self.h))
+            pygame.display.set_caption("C4")
+
+        # empty board, pre-rendered
+        self.background = pygame.Surface((self.w, self.h))
+        self.background.fill((0, 0, 255))  # blue background
+        for row in range(self.rows):
+            for col in range(self.cols):
+                pygame.draw.circle(self.background, self.empty_color, self.center(row, col), self.cell_rad)  # empty
+
+        self.drawn = None   # copy of the board shown on screen (None: nothing drawn yet)
 
-    def render(self):
+    def center(self, row: int, col: int):
+        """
+        Position of a cell relative to the window.
+        """
+        x = self.margin + col * (self.cell_rad*2 + self.margin) + self.cell_rad
+        y = self.margin + row * (self.cell_rad * 2 + self.margin) + self.cell_rad
+        return x, y
+
+    def cell_rect(self, row: int, col: int):
+        x, y = self.center(row, col)
+        return pygame.Rect(x - self.cell_rad, y - self.cell_rad, self.cell_rad * 2 + 1, self.cell_rad * 2 + 1)
+
+    def render(self, full: bool=False):
         """
         Renders game state.
+        Only cells that differ from the last frame are redrawn, unless full is set.
         """
+        board = self.state.board
+        if full or self.drawn is None or self.drawn.shape != board.shape:
+            self.screen.blit(self.background, (0, 0))
+            changed = np.argwhere(board != 0)
+            dirty = None    # whole window
+        else:
+            changed = np.argwhere(board != self.drawn)
+            dirty = []
 
-        self.screen.fill((0, 0, 255))  # blue background
-        
-        for row in range(self.rows):
-            for col in range(self.cols):
-                # calculate position relative to the window
-                x = self.margin + col * (self.cell_rad*2 + self.margin) + self.cell_rad
-                y = self.margin + row * (self.cell_rad * 2 + self.margin) + self.cell_rad
-                
-                if self.state.board[row][col] == 1:
-                    pygame.draw.circle(self.screen, (255, 0, 0), (x, y), self.cell_rad)     # p1: red
-                elif self.state.board[row][col] == 2:
-                    pygame.draw.circle(self.screen, (255, 255, 0), (x, y), self.cell_rad)   # p2: yellow
-                else:
-                    pygame.draw.circle(self.screen, self.empty_color, (x, y), self.cell_rad)     # empty: white
-    
-        pygame.display.update()
+        for row, col in changed.tolist():
+            rect = self.cell_rect(row, col)
+            self.screen.blit(self.background, rect, rect)   # back to an empty cell
+            player = board[row, col]
+            if player != 0:
+                pygame.draw.circle(self.screen, COLORS[player], self.center(row, col), self.cell_rad)
+            if dirty is not None:
+                dirty.append(rect)
+
+        self.drawn = board.copy()
+
+        if not self.headless:
+            if dirty is None:
+                pygame.display.update()
+            elif dirty:
+                pygame.display.update(dirty)
+
+    def frame(self):
+        """
+        Current frame as an (h, w, 3) uint8 array.
+        """
+        return pygame.surfarray.array3d(self.screen).transpose(1, 0, 2)
 
     def save_screenshot(self, filename):
         """
@@ -65,7 +118,36 @@ class C4Visual:
         """
         running = True
         while running:
-            for event in pygame.event.get():    
+            for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
         pygame.quit()
+
+def capture_game(moves: list, rows: int=6, cols: int=7, connect: int=4, out_path: str=None,
+                 frame_ms: int=500, cell_rad: float=20, margin: float=8):
+    """
+    Renders every position of a recorded game offscreen (e.g. from sim.records.GameLog.game_moves).
+    With out_path, frames are saved as a GIF (requires Pillow).
+
+    Returns:
+    (list, float): Frames as (h, w, 3) arrays and frames rendered per second.
+    """
+    state = C4State(rows=rows, cols=cols, connect=connect)
+    visual = C4Visual(state, cell_rad=cell_rad, margin=margin, headless=True)
+
+    frames = []
+    start = time.perf_counter()
+    visual.render()
+    frames.append(visual.frame())
+    for move in moves:
+        state.make_move(int(move))
+        visual.render()
+        frames.append(visual.frame())
+    fps = len(frames) / (time.perf_counter() - start)
+
+    if out_path is not None:
+        from PIL import Image
+        images = [Image.fromarray(frame) for frame in frames]
+        images[0].save(out_path, save_all=True, append_images=images[1:], duration=frame_ms, loop=0)
+
+    return frames, fps
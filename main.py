@@ -1,17 +1,24 @@
+import os
 import time
+import argparse
 from search.mcts import MCTS_UCT
-from sim.collect_data import *
-from sim.figures import *
 from search.minimax import Minimax
+from search.util import BudgetExceededError
 from c4.state import C4State
-from c4.visual import C4Visual
 
-def play_demo(state: C4State, budget, mm_depth: int, mcts_strat: str, is_mm_p1: bool, window: C4Visual=None, delay: float=.5):
-    
-    p1 = Minimax(budget=budget, depth=mm_depth, max_player=1) if is_mm_p1 else \
-          MCTS_UCT(budget=budget, strategy=mcts_strat, spaces=state.rows*state.cols)
-    p2 = MCTS_UCT(budget=budget, strategy=mcts_strat, spaces=state.rows*state.cols) if is_mm_p1 else \
-          Minimax(budget=budget, depth=mm_depth, max_player=1)
+# heavy modules (pandas, matplotlib, pygame, ...) are only imported by the commands that need them
+
+BEST_DEPTHS = {100: 1, 500: 2, 1000: 2, 10000: 4}   # budget with respective best depth, gathered from prev simulations (see the tune command)
+STRATEGIES = ["thrifty", "optimistic", "greedy", "adaptive"]
+LATENCY_PATH = "bin/latency.npz"    # move-time sketches of the sweeps
+
+def play_demo(state: C4State, budget, mm_depth: int, mcts_strat: str, is_mm_p1: bool, window: "C4Visual"=None, delay: float=.5,
+              ponder: bool=False):
+
+    p1 = Minimax(budget=budget, depth=mm_depth, max_player=1, ponder=ponder) if is_mm_p1 else \
+          MCTS_UCT(budget=budget, strategy=mcts_strat, spaces=state.rows*state.cols, ponder=ponder)
+    p2 = MCTS_UCT(budget=budget, strategy=mcts_strat, spaces=state.rows*state.cols, ponder=ponder) if is_mm_p1 else \
+          Minimax(budget=budget, depth=mm_depth, max_player=1, ponder=ponder)
 
     if window is not None:
         window.render()
@@ -31,7 +38,9 @@ def play_demo(state: C4State, budget, mm_depth: int, mcts_strat: str, is_mm_p1:
             budget_exceeded = True
 
         if not budget_exceeded:
-            state.make_move(move)   
+            state.make_move(move)
+            if state.winner == 0 and state.get_possible_moves():  # nothing to ponder once the game is over
+                curr_agent.ponder(state)
 
         # stop simulation if budget exception occurred
         if budget_exceeded:
@@ -41,59 +50,254 @@ def play_demo(state: C4State, budget, mm_depth: int, mcts_strat: str, is_mm_p1:
             window.render()
 
         time.sleep(delay)
-    
+
     if window is not None:
         window.render()
 
+    for agent in (p1, p2):
+        agent.stop_pondering()
+        agent.close()
+
     if state.winner != 0:
         print(f"Winner: Player {state.winner}")
     elif budget_exceeded:
         print(f"Winner: Player {state.last_player}. Player {3 - state.last_player} forfeits! (hint: not enough budget)")
     else:
         print("Draw!")
-    
-    time.sleep(3)
+
+    # leave the final board on screen for a moment
+    if window is not None:
+        time.sleep(3)
 
 def get_demo_params():
     print("Enter parameters for the demo:")
-    
+
     connect = int(input("Enter connect sequence (default 4): ") or 4)
     bf = int(input("Enter board columns (default 7): ") or 7)
     gui = (input("Enable GUI? If yes, please don't attempt to close the window (yes/no, default yes): ").lower() or 'yes') == 'yes'
     is_mm_p1 = (input("Is Minimax Player 1? (yes/no, default yes): ").lower() or 'yes') == 'yes'
     mm_depth = int(input("Enter Minimax depth (default 2): ") or 2)
     budget = int(input("Enter budget (default 500): ") or 500)
-    mcts_strat = input("Enter MCTS strategy (thrifty/optimistic/greedy, default thrifty): ") or "thrifty"
-    
+    mcts_strat = input("Enter MCTS strategy (thrifty/optimistic/greedy/adaptive, default thrifty): ") or "thrifty"
+
     return connect, bf, gui, is_mm_p1, mm_depth, budget, mcts_strat
 
-if __name__ == "__main__":
+def run_demo(connect: int, bf: int, gui: bool, is_mm_p1: bool, mm_depth: int, budget: int, mcts_strat: str,
+             delay: float=.5, ponder: bool=False):
+    initial_state = C4State(bf - 1, bf, connect)
+    window = None
+    if gui:
+        from c4.visual import C4Visual
+        window = C4Visual(initial_state, margin=30)
+
+    play_demo(state=initial_state, budget=budget, mm_depth=mm_depth, mcts_strat=mcts_strat, is_mm_p1=is_mm_p1,
+              window=window, delay=delay, ponder=ponder)
+
+def run_simulations(repeats: int=100, repeats_: int=200, workers: int=1, base_seed: int=42,
+                    store_root: str="bin/store", log_root: str="bin/games", memory_every: int=0,
+                    eval_cache: str=None):
+    """
+    Runs both sweeps. With eval_cache, Minimax evaluations are cached across games
+    ("" for memory only, or a snapshot path loaded at start and saved at the end).
+    """
+    from sim.collect_data import run_all_simulations, run_all_simulations_
+    from sim.store import ExperimentStore
+    from sim.records import GameLog
+    from sim.latency import LatencyReport
+    from search.cache import shared_eval_cache
+
+    print("This might take a while...")
+
+    cache = shared_eval_cache(path=eval_cache or None) if eval_cache is not None else None
+
+    # games already played by the current code are reused from the store
+    store = ExperimentStore(store_root)
+    log = GameLog(log_root)     # moves of every game played, for replays
+    latency = LatencyReport.load(LATENCY_PATH) if os.path.exists(LATENCY_PATH) else LatencyReport()
+    run_all_simulations(repeats, base_seed=base_seed, eval_cache=cache, store=store, workers=workers, log=log,
+                        latency=latency, memory_every=memory_every)
+    run_all_simulations_(repeats_, BEST_DEPTHS, base_seed=base_seed, eval_cache=cache, store=store, workers=workers,
+                         log=log, latency=latency, memory_every=memory_every)
+    latency.save(LATENCY_PATH)
+    if eval_cache:
+        cache.save(eval_cache)
+
+def run_arena_sweep(max_games: int=100, margin: float=100, workers: int=1, base_seed: int=42, out_dir: str="bin"):
+    """
+    Connect 4 grid of run_all_simulations as an arena: pairings stop once their SPRT is decided.
+    """
+    from sim.arena import SPRT, grid_pairings, run_arena
+
+    pairings = grid_pairings([100, 500, 1000, 10000], ["thrifty", "optimistic", "greedy"], [1, 2, 3, 4, 5])
+    os.makedirs(out_dir, exist_ok=True)
+    results, ratings = run_arena(pairings, f"{out_dir}/arena.parquet", base_seed, SPRT(margin), max_games=max_games,
+                                 workers=workers)
+    results.to_csv(f"{out_dir}/arena.csv", index=False)
+    ratings.to_csv(f"{out_dir}/arena_ratings.csv", index=False)
+
+    print(results["decision"].value_counts().to_string())
+    print(f"{results['games'].sum()} games played, {len(pairings) * max_games} in the fixed grid")
+
+def run_tuning(budgets: list=None, games: int=2, eta: int=2, workers: int=1, base_seed: int=42, out_dir: str="bin"):
+    """
+    Best Minimax depth per budget on the connect 4 board, by successive halving (see BEST_DEPTHS).
+    """
+    from sim.tune import tune_table
+
+    budgets = budgets if budgets is not None else list(BEST_DEPTHS)
+    os.makedirs(out_dir, exist_ok=True)
+    table = tune_table(budgets, [(6, 7, 4)], [1, 2, 3, 4, 5], ["thrifty", "optimistic", "greedy"], base_seed,
+                       games, eta, workers, f"{out_dir}/tune.parquet")
+    table.to_csv(f"{out_dir}/best_depths.csv", index=False)
+
+    print(table.to_string(index=False))
+    print(f"{table['games'].sum()} games played, {len(budgets) * 5 * 3 * 2 * 100} in the full grid")
+    print(f"best depths: {dict(zip(table['budget'].tolist(), table['best_depth'].tolist()))}")
+
+def run_dataset(root: str="bin/positions", n_positions: int=10000, shard_size: int=1000, sampler: str="random",
+                label: str="minimax", depth: int=4, iterations: int=1000, workers: int=1, seed: int=42):
+    """
+    Labelled positions of the board shapes of both sweeps (see sim/dataset.py).
+    """
+    from sim.dataset import generate_dataset
+
+    shapes = [(6, 7, 4), (5, 6, 3), (7, 8, 5), (8, 9, 6), (9, 10, 7)]
+    generate_dataset(root, shapes, n_positions, shard_size, sampler, label, depth, iterations, workers, seed)
+
+def make_figures(out_dir: str="bin"):
+    from sim.figures import fig_1, fig_2, fig_3, fig_4
+
+    fig_1("bin/simulations_1.parquet", f"{out_dir}/fig_1.png")
+    fig_2("bin/simulations_1.parquet", BEST_DEPTHS, f"{out_dir}/fig_2.png")
+    fig_3("bin/simulations_1.parquet", BEST_DEPTHS, f"{out_dir}/fig_3.png")
+    fig_4("bin/simulations_1.parquet", "bin/simulations_2.parquet", BEST_DEPTHS, f"{out_dir}/fig_4.png")
+
+    # tail latency (sketches kept by the sweeps, or rebuilt from the outputs)
+    from sim.latency import LatencyReport
+    if os.path.exists(LATENCY_PATH):
+        latency = LatencyReport.load(LATENCY_PATH)
+    else:
+        latency = LatencyReport.from_moves("bin/simulations_1.parquet").merge(LatencyReport.from_moves("bin/simulations_2.parquet"))
+    latency.summary().to_csv(f"{out_dir}/latency.csv", index=False)
+    latency.plot(f"{out_dir}/fig_latency.png")
+
+def run_bench(name: str):
+    from sim import benchmarks
+
+    if name == "parallel":
+        benchmarks.bench_parallel_minimax()
+    elif name == "rollouts":
+        benchmarks.bench_rollout_length()
+    elif name == "threats":
+        benchmarks.bench_threat_pruning()
+    elif name == "render":
+        benchmarks.bench_render()
+
+def interactive():
     print("#####################")
     print("# CONNECT X SEARCH: #")
     print("#####################")
     choice = input("Do you want to run a demo or simulations? (demo/simulations, default demo): ").lower() or "demo"
 
     if choice == "demo":
-        connect, bf, gui, is_mm_p1, mm_depth, budget, mcts_strat = get_demo_params()
-        
-        initial_state = C4State(bf - 1, bf, connect)
-        window = None if not gui else C4Visual(initial_state, margin=30)
+        run_demo(*get_demo_params())
 
-        play_demo(state=initial_state, budget=budget, mm_depth=mm_depth, mcts_strat=mcts_strat, is_mm_p1=is_mm_p1, window=window)
-    
     elif choice == "simulations":
-        print("This might take a while...")
-
-        run_all_simulations(100)
-        
-        budgets = {100: 1, 500: 2, 1000: 2, 10000: 4}   # budget with respective best depth, gathered from prev simulations
-        run_all_simulations_(200, budgets)
-
-        fig_1("bin/simulations_1.parquet", "bin/fig_1.png")
-        fig_2("bin/simulations_1.parquet", budgets, "bin/fig_2.png")
-        fig_3("bin/simulations_1.parquet", budgets, "bin/fig_3.png")
-        fig_4("bin/simulations_1.parquet", "bin/simulations_2.parquet", budgets, "bin/fig_4.png")
-    
+        run_simulations()
+        make_figures()
+
     else:
         print("Invalid option, please select either 'demo' or 'simulations'.")
-    
\ No newline at end of file
+
+def halving_rate(value: str):
+    # successive halving keeps 1/eta of the depths every round, so eta < 2 never ends
+    eta = int(value)
+    if eta < 2:
+        raise argparse.ArgumentTypeError(f"eta must be at least 2, got {eta}")
+    return eta
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Connect X search: Minimax vs. MCTS. Prompts for parameters without a command.")
+    commands = parser.add_subparsers(dest="command")
+
+    demo = commands.add_parser("demo", help="play one game")
+    demo.add_argument("--connect", type=int, default=4, help="connect sequence")
+    demo.add_argument("--cols", type=int, default=7, help="board columns (rows = cols - 1)")
+    demo.add_argument("--gui", action=argparse.BooleanOptionalAction, default=True, help="show the board in a window")
+    demo.add_argument("--mm-p1", action=argparse.BooleanOptionalAction, default=True, help="Minimax plays first")
+    demo.add_argument("--depth", type=int, default=2, help="Minimax depth")
+    demo.add_argument("--budget", type=int, default=500, help="budget of both agents")
+    demo.add_argument("--strategy", choices=STRATEGIES, default="thrifty", help="MCTS strategy")
+    demo.add_argument("--delay", type=float, default=.5, help="seconds between moves")
+    demo.add_argument("--ponder", action="store_true", help="search during the opponent's turn")
+
+    simulate = commands.add_parser("simulate", help="run both simulation sweeps")
+    simulate.add_argument("--repeats", type=int, default=100, help="games per configuration (connect 4 sweep)")
+    simulate.add_argument("--repeats-shapes", type=int, default=200, help="games per configuration (board shapes sweep)")
+    simulate.add_argument("--workers", type=int, default=1, help="worker processes")
+    simulate.add_argument("--seed", type=int, default=42, help="base seed")
+    simulate.add_argument("--store", default="bin/store", help="experiment store directory")
+    simulate.add_argument("--log", default="bin/games", help="game log directory")
+    simulate.add_argument("--memory-every", type=int, default=0, help="measure the memory use of one game in N (0: off)")
+    simulate.add_argument("--eval-cache", nargs="?", const="", default=None, metavar="PATH",
+                          help="cache Minimax evaluations across games, kept in PATH (.npy) if given")
+    simulate.add_argument("--figures", action="store_true", help="render the figures afterwards")
+
+    arena = commands.add_parser("arena", help="play the connect 4 grid until each pairing is statistically settled")
+    arena.add_argument("--max-games", type=int, default=100, help="games per pairing at most")
+    arena.add_argument("--margin", type=float, default=100, help="Elo difference tested by the SPRT (+/-)")
+    arena.add_argument("--workers", type=int, default=1, help="worker processes")
+    arena.add_argument("--seed", type=int, default=42, help="base seed")
+    arena.add_argument("--out", default="bin", help="output directory")
+
+    tune = commands.add_parser("tune", help="find the best Minimax depth per budget by successive halving")
+    tune.add_argument("--budgets", type=int, nargs="+", default=list(BEST_DEPTHS), help="budgets to tune")
+    tune.add_argument("--games", type=int, default=2, help="games per strategy and colour in the first round")
+    tune.add_argument("--eta", type=halving_rate, default=2, help="fraction of depths kept every round (>= 2)")
+    tune.add_argument("--workers", type=int, default=1, help="worker processes")
+    tune.add_argument("--seed", type=int, default=42, help="base seed")
+    tune.add_argument("--out", default="bin", help="output directory")
+
+    dataset = commands.add_parser("dataset", help="generate positions labelled by search (resumes existing shards)")
+    dataset.add_argument("--out", default="bin/positions", help="output directory")
+    dataset.add_argument("--positions", type=int, default=10000, help="positions per board shape")
+    dataset.add_argument("--shard-size", type=int, default=1000, help="positions per shard")
+    dataset.add_argument("--sampler", choices=["random", "mcts"], default="random", help="how positions are reached")
+    dataset.add_argument("--label", choices=["minimax", "mcts"], default="minimax", help="search labelling positions")
+    dataset.add_argument("--depth", type=int, default=4, help="Minimax depth of the labels")
+    dataset.add_argument("--iterations", type=int, default=1000, help="MCTS iterations of the labels")
+    dataset.add_argument("--workers", type=int, default=1, help="worker processes")
+    dataset.add_argument("--seed", type=int, default=42, help="base seed")
+
+    figures = commands.add_parser("figures", help="render the figures from the simulation outputs")
+    figures.add_argument("--out", default="bin", help="output directory")
+
+    bench = commands.add_parser("bench", help="run a benchmark")
+    bench.add_argument("name", choices=["parallel", "rollouts", "threats", "render"])
+
+    return parser
+
+if __name__ == "__main__":
+    args = get_parser().parse_args()
+
+    if args.command is None:
+        interactive()
+    elif args.command == "demo":
+        run_demo(args.connect, args.cols, args.gui, args.mm_p1, args.depth, args.budget, args.strategy,
+                 delay=args.delay, ponder=args.ponder)
+    elif args.command == "simulate":
+        run_simulations(args.repeats, args.repeats_shapes, args.workers, args.seed, args.store, args.log, args.memory_every,
+                        args.eval_cache)
+        if args.figures:
+            make_figures()
+    elif args.command == "arena":
+        run_arena_sweep(args.max_games, args.margin, args.workers, args.seed, args.out)
+    elif args.command == "tune":
+        run_tuning(args.budgets, args.games, args.eta, args.workers, args.seed, args.out)
+    elif args.command == "dataset":
+        run_dataset(args.out, args.positions, args.shard_size, args.sampler, args.label, args.depth, args.iterations,
+                    args.workers, args.seed)
+    elif args.command == "figures":
+        make_figures(args.out)
+    elif args.command == "bench":
+        run_bench(args.name)
@@ -0,0 +1,115 @@
+import os
+import numpy as np
+from collections import OrderedDict
+from c4.state import C4State
+
+def cache_key(state: C4State, max_player: int):
+    """
+    64-bit key of an evaluation: zobrist hash of the board, salted with the
+    connect length (top bits mixed in) and the player the evaluation is for (last bit).
+    """
+    salt = (state.connect * 0x9E3779B97F4A7C15) & (2**63 - 1)
+    return (state.hash ^ salt) | ((max_player - 1) << 63)
+
+class EvalCache(object):
+    """
+    Bounded, position-keyed cache of evaluation_function results, meant to be shared
+    by every Minimax instance of a process (see shared_eval_cache).
+
+    Recent entries live in an in-memory LRU table. A sorted snapshot can be saved to
+    a compact .npy file and memory-mapped back in as a read-only second level.
+    """
+
+    dtype = np.dtype([("key", "<u8"), ("value", "<f8")])
+
+    def __init__(self,
+                 max_entries: int=1_000_000,
+                 path: str=None
+                 ):
+        self.max_entries = max_entries
+        self.path = path        # snapshot loaded at start (None for memory only)
+        self.table = OrderedDict()
+        self.disk = None        # memory-mapped snapshot (sorted by key)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def get(self, key: int):
+        """
+        Cached value for key, None on a miss.
+        """
+        value = self.table.get(key)
+        if value is not None:
+            self.table.move_to_end(key)
+            self.hits += 1
+            return value
+
+        if self.disk is not None and len(self.disk) > 0:
+            keys = self.disk["key"]
+            i = np.searchsorted(keys, np.uint64(key))
+            if i < len(keys) and keys[i] == key:
+                value = float(self.disk["value"][i])
+                self.put(key, value)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key: int, value: float):
+        self.table[key] = value
+        self.table.move_to_end(key)
+        if len(self.table) > self.max_entries:
+            self.table.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.table),
+            "disk_entries": 0 if self.disk is None else len(self.disk),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def save(self, path: str):
+        """
+        Writes the memory table merged with the current snapshot to path, sorted by key.
+        """
+        entries = np.array(list(self.table.items()), dtype=self.dtype)
+        if self.disk is not None:
+            entries = np.concatenate([entries, np.asarray(self.disk)])
+        # memory entries come first, so they win over stale snapshot ones
+        _, first = np.unique(entries["key"], return_index=True)
+        entries = entries[first]
+
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, entries)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        """
+        Memory-maps a snapshot written by save.
+        """
+        self.disk = np.load(path, mmap_mode="r")
+
+_shared_caches = {}     # (max_entries, path) -> EvalCache
+
+def shared_eval_cache(max_entries: int=1_000_000, path: str=None):
+    """
+    Process-wide evaluation cache of a size and snapshot path, created on first use.
+    Lives across run_simulation calls so that positions repeated between games are scored once.
+    """
+    key = (max_entries, path)
+    if key not in _shared_caches:
+        _shared_caches[key] = EvalCache(max_entries=max_entries, path=path)
+    return _shared_caches[key]
@@ -1,8 +1,11 @@
-import random
+import time
+import numpy as np
 from math import sqrt, log
-from search.node import NodeMCTS
+from collections import OrderedDict
+from search.node import NodeMCTS, NodeMCTS_TT
 from c4.state import C4State
-from search.util import BudgetExceededError
+from search.util import BudgetExceededError, RandomBuffer
+from search.ponder import Ponderer
 
 # implementation taken from James Stovold's lab material
 
@@ -12,14 +15,63 @@ class MCTS_UCT:
                  budget: int, 
                  strategy: str,
                  spaces: int,
-                 exploration_factor: float=sqrt(2)
+                 exploration_factor: float=sqrt(2),
+                 rave: bool=False,
+                 rave_k: float=250,
+                 rng: np.random.Generator=None,
+                 time_per_move_ms: float=None,
+                 game_time_ms: float=None,
+                 check_every: int=16,
+                 max_nodes: int=None,
+                 prune_policy: str="freeze",
+                 reclaim_depth: int=2,
+                 ponder: bool=False
                  ):
         self.budget = budget
+        self.strategy = strategy
         self.exploration_factor = exploration_factor
+        self.rave = rave        # all-moves-as-first statistics blended into the ucb score
+        self.rave_k = rave_k    # equivalence parameter: visits at which AMAF and UCT values weigh the same
+        self.random = RandomBuffer(rng)     # agent's own random stream (unseeded if rng is None)
+        self.search_random = self.random
         self.rootnode = None
         self.turn_count = 0
+        self.iterations = []    # iterations completed on each move
+
+        # wall-clock mode: iteration budget is replaced by a time allowance per move
+        self.time_per_move_ms = time_per_move_ms
+        self.clock_ms = game_time_ms    # remaining time on the game clock (None for no clock)
+        self.check_every = check_every  # iterations between clock checks
+
+        # memory bound: once the tree holds max_nodes nodes, either stop expanding ('freeze')
+        # or collapse the least visited subtrees at depth >= reclaim_depth ('reclaim')
+        if prune_policy not in ("freeze", "reclaim"):
+            raise ValueError(f"Unknown prune policy '{prune_policy}'.")
+        self.max_nodes = max_nodes
+        self.prune_policy = prune_policy
+        self.reclaim_depth = reclaim_depth
+        self.n_nodes = 0        # nodes currently in the tree
+        self.peak_nodes = 0     # max nodes held during the last move
+        self.n_reclaimed = 0    # nodes reclaimed during the last move
+        self.n_created = 0      # nodes created during the last move
+
+        # pondering: keep searching the tree during the opponent's turn (see ponder)
+        self.pondering = ponder
+        self.ponderer = Ponderer()
+        self.ponder_root = None
+        self.ponder_state = None
+        self.ponder_limit = None    # iterations pondered before our next move (None: until it is asked for)
+        self.ponder_visits = {}     # visits of the pondered root's children when pondering started
+        self.pondered_visits = 0    # visits the reused subtree gained while pondering, charged to the move
+        self.ponder_work = []   # iterations run while pondering before each move
+        # with an iteration budget, pondering runs the allocation of our next move (finished at that move
+        # if the opponent was quicker) on a stream of its own, spawned from rng, and the visits it gave to
+        # the reply actually played are charged to that move: games with pondering are reproducible and
+        # pondering saves time, not budget. Wall-clock searches ponder until asked for a move.
+        self.ponder_random = RandomBuffer(np.random.default_rng(self.random.rng.bit_generator.seed_seq.spawn(1)[0]))
 
         max_moves = spaces//2
+        self.max_moves = max_moves
 
         # budget allocations for each move
         if strategy == "greedy":
@@ -34,6 +86,9 @@ class MCTS_UCT:
             self.budget_alloc[-1] += budget - sum(self.budget_alloc)  # correct rounding errors
         elif strategy == "thrifty":
             self.budget_alloc = [budget//max_moves]*max_moves
+        elif strategy == "adaptive":
+            # allocations are computed on the fly from the remaining budget (see adaptive_itermax)
+            self.budget_alloc = None
 
     def pick_move(self, rootstate: C4State):
         """
@@ -46,7 +101,17 @@ class MCTS_UCT:
         Returns:
         (int): Action that will be taken by an agent (column of C4 grid).
         """
-        self.rootnode = NodeMCTS(state=rootstate)
+        reused = self.pondered_root(rootstate) if self.pondering else None
+        self.rootnode = reused if reused is not None else self.make_root(rootstate)
+        self.n_nodes = self.peak_nodes = self.subtree_size(self.rootnode) if reused is not None else 1
+        self.n_created = 0 if reused is not None else 1
+        self.n_reclaimed = 0
+
+        if self.time_per_move_ms is not None or self.clock_ms is not None:
+            return self.timed_search(rootstate)
+
+        if self.strategy == "adaptive":
+            return self.adaptive_search(rootstate)
         
         itermax = self.budget_alloc[self.turn_count]
         self.budget -= itermax
@@ -55,23 +120,233 @@ class MCTS_UCT:
         if itermax == 0:
             raise BudgetExceededError("MCTS ran out of computational budget!")
         
-        for _ in range(itermax):
-            
-            state = rootstate.copy()
-            
-            node = self.selection(self.rootnode, state)
-            child = self.expansion(node, state)
-            
-            self.rollout(state)
-            self.backpropagation(child, state)
+        # visits gained while pondering were paid for by this allocation (at least one iteration without children)
+        run = max(itermax - self.pondered_visits, 0 if self.rootnode.children else 1)
+        for _ in range(run):
+            self.iteration(rootstate)
+        self.iterations.append(run)
+
+        return self.rootnode.best_move()["move"]
+
+    def make_root(self, rootstate: C4State):
+        return NodeMCTS(state=rootstate)
+
+    def close(self):
+        # nothing to release (same interface as Minimax.close)
+        pass
+
+    def ponder(self, state: C4State):
+        """
+        Starts searching in the background from the position after our move, while the opponent thinks.
+        The subtree of our move is kept, so the statistics gathered for it are reused.
+        """
+        if not self.pondering:
+            return
+
+        self.ponder_root = None
+        if self.rootnode is not None:
+            for move, child in self.rootnode.edges():
+                if move == state.last_move:
+                    self.ponder_root = child
+        if self.ponder_root is None:
+            self.ponder_root = self.make_root(state)
+        self.ponder_root.parent = None
+        self.rootnode = self.ponder_root
+
+        self.ponder_visits = {move: child.visits for move, child in self.ponder_root.edges()}
+        self.ponder_state = state.copy()
+        self.ponder_limit = self.ponder_itermax()
+        self.random = self.ponder_random
+
+        def step():
+            if self.ponder_limit is not None and self.ponderer.steps >= self.ponder_limit:
+                return False
+            self.iteration(self.ponder_state)
+
+        self.ponderer.start(step)
+
+    def ponder_itermax(self):
+        """
+        Iterations pondered before our next move: the allocation of that move, which they are charged to
+        (None in wall-clock mode).
+        """
+        if self.time_per_move_ms is not None or self.clock_ms is not None:
+            return None
+        if self.strategy == "adaptive":
+            return self.adaptive_itermax()
+        return self.budget_alloc[self.turn_count] if self.turn_count < len(self.budget_alloc) else 0
+
+    def stop_pondering(self):
+        self.ponder_work.append(self.ponderer.stop())
+        self.random = self.search_random
+
+    def pondered_root(self, rootstate: C4State):
+        """
+        Stops pondering and returns the pondered subtree of the opponent's actual move (None if missing).
+        The rest of the pondered tree is discarded.
+        """
+        self.stop_pondering()
+        self.pondered_visits = 0
+        ponder_root, self.ponder_root = self.ponder_root, None
+        if ponder_root is None:
+            return None
+
+        # the iterations the opponent did not leave time for are run now, so the tree does not depend on timing
+        left = self.ponder_limit - self.ponder_work[-1] if self.ponder_limit is not None else 0
+        if left > 0:
+            self.random = self.ponder_random
+            for _ in range(left):
+                self.iteration(self.ponder_state)
+            self.random = self.search_random
+            self.ponder_work[-1] += left
+
+        for move, child in ponder_root.edges():
+            if move == rootstate.last_move:
+                child.parent = None
+                if self.ponder_limit is not None:
+                    self.pondered_visits = child.visits - self.ponder_visits.get(move, 0)
+                return child
+        return None
+
+    def iteration(self, rootstate: C4State):
+        """
+        Runs a single selection-expansion-rollout-backpropagation cycle from the root.
+        """
+        state = rootstate.copy()
+        
+        node = self.selection(self.rootnode, state)
+        child = self.expansion(node, state)
+        
+        played = self.rollout(state)
+        self.backpropagation(child, state)
+
+        if self.rave:
+            self.amaf_backpropagation(self.ancestors(child), state, played)
+
+    def adaptive_itermax(self):
+        """
+        Iterations given to the current move by the 'adaptive' strategy.
+        The remaining budget is split evenly over the moves we may still have to play,
+        so iterations left unspent by early stopping are banked for later moves.
+        """
+        moves_left = max(self.max_moves - self.turn_count, 1)
+        return self.budget // moves_left
+
+    def adaptive_search(self, rootstate: C4State):
+        """
+        Search loop of the 'adaptive' strategy.
+
+        The search stops as soon as the most visited root child cannot be overtaken with the 
+        remaining iterations. If the two most visited children are still close once the 
+        allocation is spent, the search is extended with banked budget.
+        The move returned is the most visited root child (the one early stopping reasons about).
+        """
+        itermax = self.adaptive_itermax()
+        self.turn_count += 1
+
+        if itermax == 0:
+            raise BudgetExceededError("MCTS ran out of computational budget!")
+
+        close_ratio = 0.8   # runner-up visits relative to the leader to consider the position close
+        limit = itermax
+        spent = min(self.pondered_visits, itermax) if self.rootnode.children else 0   # paid by pondering
+        run = 0
+        while spent < limit:
+            self.iteration(rootstate)
+            spent += 1
+            run += 1
+
+            if self.is_decided(limit - spent):
+                break
+
+            # close root statistics: extend search with up to one extra allocation from the bank
+            if spent == limit and limit == itermax and self.is_close(close_ratio):
+                limit += min(itermax, self.budget - itermax)
+
+        self.budget -= spent
+        self.iterations.append(run)
+
+        return self.rootnode.most_visited()["move"]
+
+    def time_allocation(self):
+        """
+        Milliseconds given to the current move in wall-clock mode.
+        With a game clock, the remaining time is split following the proportions of the
+        iteration schedule of the strategy ('adaptive' splits it evenly), and capped by time_per_move_ms.
+        """
+        if self.clock_ms is None:
+            return self.time_per_move_ms
+
+        if self.budget_alloc is None or sum(self.budget_alloc[self.turn_count:]) == 0:
+            share = 1 / max(self.max_moves - self.turn_count, 1)
+        else:
+            share = self.budget_alloc[self.turn_count] / sum(self.budget_alloc[self.turn_count:])
+
+        allocation = self.clock_ms * share
+        if self.time_per_move_ms is not None:
+            allocation = min(allocation, self.time_per_move_ms)
+        return allocation
+
+    def timed_search(self, rootstate: C4State):
+        """
+        Anytime search loop: iterates until the move's time allowance runs out, reading
+        the clock every check_every iterations, and returns the current best root child.
+        Iterations are still subtracted from the budget for reporting, but the budget is not enforced.
+        """
+        allocation = self.time_allocation()
+        self.turn_count += 1
+
+        if allocation <= 0:
+            raise BudgetExceededError("MCTS ran out of time!")
+
+        start = time.perf_counter()
+        deadline = start + allocation / 1000
+        done = 0
+        while True:
+            for _ in range(self.check_every):
+                self.iteration(rootstate)
+            done += self.check_every
+            if time.perf_counter() >= deadline:
+                break
+
+        if self.clock_ms is not None:
+            self.clock_ms -= (time.perf_counter() - start) * 1000
+
+        self.budget -= done
+        self.iterations.append(done)
 
         return self.rootnode.best_move()["move"]
 
+    def top_visits(self):
+        """
+        Visit counts of the two most visited root children (0 if missing).
+        """
+        visits = sorted((child.visits for child in self.rootnode.children), reverse=True) + [0, 0]
+        return visits[0], visits[1]
+
+    def is_decided(self, remaining: int):
+        """
+        True if the leading root child cannot be caught in visits with the remaining iterations.
+        """
+        if not self.rootnode.is_fully_expanded():
+            return False
+        first, second = self.top_visits()
+        return first - second > remaining
+
+    def is_close(self, ratio: float):
+        first, second = self.top_visits()
+        return first > 0 and second >= ratio * first
+
     def ucb1(self, 
              node: NodeMCTS, 
              child: NodeMCTS, 
              ):
-        return child.wins / child.visits + self.exploration_factor * sqrt(log(node.visits) / child.visits)
+        value = child.wins / child.visits
+        if self.rave and child.amaf_visits > 0:
+            # beta decays from 1 to 0 as the child gathers its own visits (Gelly & Silver, 2011)
+            beta = sqrt(self.rave_k / (3 * child.visits + self.rave_k))
+            value = (1 - beta) * value + beta * child.amaf_wins / child.amaf_visits
+        return value + self.exploration_factor * sqrt(log(node.visits) / child.visits)
     
     def selection(self, 
                   node: NodeMCTS, 
@@ -85,17 +360,234 @@ class MCTS_UCT:
 
     def expansion(self, node: NodeMCTS, state: C4State):
         child = node
-        if node.untried_moves != []:  # if we can expand (i.e. state/node is non-terminal)
-            move = random.choice(node.untried_moves)
+        if node.untried_moves != [] and self.can_expand(node):  # if we can expand (i.e. state/node is non-terminal)
+            move = self.random.choice(node.untried_moves)
             state.make_move(move)
             child = node.add_child(move, state)
+            self.count_node()
         return child
 
+    def count_node(self):
+        self.n_nodes += 1
+        self.n_created += 1
+        self.peak_nodes = max(self.peak_nodes, self.n_nodes)
+
+    def can_expand(self, node: NodeMCTS):
+        """
+        False if the node cap is reached and no memory could be reclaimed to expand node.
+        Iterations that cannot expand still roll out and update the existing nodes.
+        """
+        if self.max_nodes is None or self.n_nodes < self.max_nodes:
+            return True
+        if self.prune_policy == "reclaim":
+            self.reclaim(node)
+        return self.n_nodes < self.max_nodes
+
+    def reclaim(self, expanded: NodeMCTS):
+        """
+        Collapses the least visited subtrees at depth >= reclaim_depth until the tree is back 
+        to 90% of max_nodes. A collapsed node keeps its statistics and its moves become untried again.
+        The ancestors of the node being expanded are kept, so the new child stays in the tree.
+        """
+        target = int(self.max_nodes * 0.9)
+        path = {id(node) for node, _ in self.ancestors(expanded.parent)}
+
+        candidates = []
+        stack = [(self.rootnode, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if depth >= self.reclaim_depth and node.children != [] and id(node) not in path:
+                candidates.append((node.visits, -depth, len(candidates), node))
+            stack.extend((child, depth + 1) for child in node.children)
+
+        # deepest first on ties, so descendants are always collapsed before their ancestors
+        for _, _, _, node in sorted(candidates):
+            if self.n_nodes <= target:
+                break
+            removed = self.subtree_size(node) - 1
+            node.untried_moves += [move for move, _ in node.edges()]
+            node.children = []
+            self.n_nodes -= removed
+            self.n_reclaimed += removed
+
+    def subtree_size(self, node: NodeMCTS):
+        size = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            size += 1
+            stack.extend(node.children)
+        return size
+
     def rollout(self, state: C4State):
-        while state.get_possible_moves() != []:
-            state.make_move(random.choice(state.get_possible_moves()))
+        """
+        Plays random moves until the game ends, or until it can only end in a draw.
+        Returns the (player, move) pairs played, used by RAVE.
+        """
+        played = []
+        moves = state.get_possible_moves()
+        while moves != [] and not state.is_dead_draw():
+            state.make_move(self.random.choice(moves))
+            played.append((state.last_player, state.last_move))
+            moves = state.get_possible_moves()
+        return played
 
     def backpropagation(self, node: NodeMCTS, state: C4State):
         if node is not None:
             node.update(int(state.winner == node.last_player))
-            self.backpropagation(node.parent, state)
\ No newline at end of file
+            self.backpropagation(node.parent, state)
+
+    def ancestors(self, node: NodeMCTS):
+        """
+        (node, move leading to it) pairs on the path from the given node up to the root.
+        """
+        while node is not None:
+            yield node, node.move
+            node = node.parent
+
+    def amaf_backpropagation(self, path, state: C4State, played: list):
+        """
+        Updates the AMAF statistics of the siblings along the selected path.
+        At each node, every child whose move was later played by the same player 
+        (in the tree or during the rollout) is credited with the rollout result.
+
+        Parameters:
+        path (iterable): (node, move leading to it) pairs, from the node where the rollout started up to the root.
+        state (C4State): Terminal state reached by the rollout.
+        played (list): (player, move) pairs played during the rollout.
+        """
+        seen = set(played)
+        for node, move in path:
+            for child_move, child in node.edges():
+                if (child.last_player, child_move) in seen:
+                    child.update_amaf(int(state.winner == child.last_player))
+            seen.add((node.last_player, move))
+
+
+class MCTS_TT(MCTS_UCT):
+    """
+    MCTS-UCT over a transposition table.
+    Nodes are keyed by the zobrist hash of their position, so the same board reached through 
+    different move orders shares a single node and its statistics (the search graph is a DAG).
+    Backpropagation follows the path actually selected in each iteration.
+    """
+
+    def __init__(self, 
+                 budget: int, 
+                 strategy: str,
+                 spaces: int,
+                 exploration_factor: float=sqrt(2),
+                 rave: bool=False,
+                 rave_k: float=250,
+                 table_size: int=None,
+                 rng: np.random.Generator=None,
+                 time_per_move_ms: float=None,
+                 game_time_ms: float=None,
+                 check_every: int=16,
+                 max_nodes: int=None,
+                 ponder: bool=False
+                 ):
+        # shared nodes cannot be reclaimed safely, so the node cap only stops expansion
+        super().__init__(budget, strategy, spaces, exploration_factor, rave, rave_k, rng,
+                         time_per_move_ms, game_time_ms, check_every, max_nodes, "freeze", ponder=ponder)
+        self.table_size = table_size    # max live nodes (None for no limit), least recently used leaves are freed
+        self.table = OrderedDict()
+        self.n_transpositions = 0       # node creations avoided on the last move
+
+    def make_root(self, rootstate: C4State):
+        rootnode = NodeMCTS_TT(state=rootstate)
+        self.table = OrderedDict({rootstate.hash: rootnode})
+        self.n_transpositions = 0
+        return rootnode
+
+    def pondered_root(self, rootstate: C4State):
+        rootnode = super().pondered_root(rootstate)
+        if rootnode is not None:
+            # keep only the positions still reachable from the new root, leaves first (evicted first),
+            # and drop the links from the discarded part of the graph
+            nodes = self.reachable(rootnode)
+            kept = set(map(id, nodes))
+            for node in nodes:
+                node.parents = [parent for parent in node.parents if id(parent) in kept]
+            self.table = OrderedDict((node.hash, node) for node in reversed(nodes))
+            self.n_transpositions = 0
+        return rootnode
+
+    def subtree_size(self, node: NodeMCTS_TT):
+        # shared nodes are counted once
+        return len(self.reachable(node))
+
+    def reachable(self, node: NodeMCTS_TT):
+        """
+        Distinct nodes reachable from node, parents before children.
+        """
+        seen = {id(node)}
+        nodes = [node]
+        for node in nodes:
+            for child in node.children:
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    nodes.append(child)
+        return nodes
+
+    def iteration(self, rootstate: C4State):
+        state = rootstate.copy()
+        node = self.rootnode
+        path = [(node, None)]
+
+        # selection
+        while node.is_fully_expanded() and node.children != []:
+            parent = node
+            move, node = sorted(parent.edges(), key=lambda edge: self.ucb1(parent, edge[1]))[-1]
+            state.make_move(move)
+            path.append((node, move))
+
+        # expansion
+        if node.untried_moves != [] and self.can_expand(node):
+            move = self.random.choice(node.untried_moves)
+            state.make_move(move)
+            node = self.lookup(node, move, state)
+            path.append((node, move))
+
+        played = self.rollout(state)
+
+        for node, _ in path:
+            node.update(int(state.winner == node.last_player))
+
+        # most recently used last, ancestors after their descendants (leaves get evicted first)
+        for node, _ in reversed(path):
+            self.table.move_to_end(node.hash)
+
+        if self.rave:
+            self.amaf_backpropagation(reversed(path), state, played)
+
+    def lookup(self, node: NodeMCTS_TT, move: int, state: C4State):
+        """
+        Links the node reached by playing move to its parent, creating it only if the 
+        position is not already in the table.
+        """
+        child = self.table.get(state.hash)
+        if child is not None:
+            self.n_transpositions += 1
+            self.table.move_to_end(state.hash)
+            return node.add_child(move, state, child)
+
+        child = node.add_child(move, state)
+        self.count_node()
+        self.table[state.hash] = child
+        if self.table_size is not None and len(self.table) > self.table_size:
+            self.evict()
+        return child
+
+    def evict(self):
+        """
+        Frees the least recently used leaf: it is unlinked from its parents and dropped from the table,
+        so the table holds every live node. Its position is expanded again (as a new node) if revisited.
+        """
+        for key, node in self.table.items():
+            if node.children == [] and node is not self.rootnode:
+                node.unlink()
+                del self.table[key]
+                self.n_nodes -= 1
+                self.n_reclaimed += 1
+                return
@@ -1,39 +1,252 @@
+import random
+import multiprocessing
 from c4.state import C4State
 from search.node import NodeMinimax
 from search.util import evaluation_function, BudgetExceededError
+from search.cache import EvalCache, cache_key
+from search.tt import SharedTT, EXACT, LOWER, UPPER
+from search.ponder import Ponderer
 
 class Minimax:
 
     def __init__(self, 
                  budget: int, 
                  depth: int, 
-                 max_player: int
+                 max_player: int,
+                 eval_cache: EvalCache=None,
+                 charge_cache_hits: bool=True,
+                 workers: int=1,
+                 deterministic: bool=False,
+                 tt_size: int=2**20,
+                 ponder: bool=False,
+                 ponder_budget: int=None,
+                 threat_pruning: bool=False
                  ):
         self.depth = depth
         self.budget = budget    # max number of game state evaluations
         self.rootnode = NodeMinimax()
         self.prev_rootnode = self.rootnode
         self.max_player = max_player
+        self.eval_cache = eval_cache                # shared evaluation cache (None to disable)
+        self.charge_cache_hits = charge_cache_hits  # if False, evaluations found in the cache are not charged to the budget
+        self.threat_pruning = threat_pruning        # cut interior nodes with immediate wins or forced blocks
+        self.nodes_per_depth = [0] * (depth + 1)    # nodes searched at each ply on the last move
+        self.n_created = None   # nodes created during the last move (None: the whole tree, built for the move)
+
+        # parallel search (workers > 1):
+        #   - deterministic: root splitting after the first child (YBWC at the root), same move regardless of timing
+        #   - otherwise: Lazy SMP, helpers search the root with staggered depths and share a transposition table
+        self.workers = workers
+        self.deterministic = deterministic
+        self.tt = None              # shared transposition table (Lazy SMP only)
+        self.stop = None            # shared flag telling helpers to stop
+        self.shuffle = None         # random.Random used by helpers to diversify move ordering
+        self.pool = None            # worker processes, started by the first parallel search (see get_pool, close)
+        self.helper_nodes = 0       # nodes searched by Lazy SMP helpers on the last move (not charged to the budget)
+
+        if workers > 1:
+            if not deterministic:
+                self.tt = SharedTT(tt_size)
+                self.stop = multiprocessing.RawValue("b", 0)
+
+        # pondering: search the likely opponent replies during the opponent's turn (see ponder)
+        self.pondering = ponder
+        self.ponder_budget = ponder_budget   # nodes per reply (None: the budget left when pondering starts)
+        self.ponderer = Ponderer()
+        self.pondered = {}      # position hash -> (search tree, move, nodes) of finished pondering searches
+        self.ponder_nodes = 0
+        self.ponder_work = []   # nodes searched while pondering before each move (see pick_move for what is charged)
 
     def pick_move(self, rootstate: C4State):
+
+        if self.pondering:
+            self.stop_pondering()
+            pondered, self.pondered = self.pondered.get(rootstate.hash), {}
+            if pondered is not None:
+                # the opponent played a predicted reply: reuse its search, charged as if it was run now
+                # (pondering saves time, not budget, so budgeted games play the same with or without it)
+                self.prev_rootnode = self.rootnode
+                rootnode, move, nodes = pondered
+                if nodes > self.budget:
+                    self.budget = 0
+                    return self.fallback_mode(rootstate)
+                self.budget -= nodes
+                self.rootnode = rootnode
+                self.n_created = 0
+                return move
         
         self.prev_rootnode = self.rootnode
         self.rootnode = NodeMinimax()
+        self.nodes_per_depth = [0] * (self.depth + 1)
+        self.n_created = None
 
         state = rootstate.copy()
+        is_maximizing = False if state.last_player == self.max_player else True
 
         try:
-            self.alpha_beta(self.rootnode,
-                            state,
-                            self.depth,
-                            alpha=float('-inf'),
-                            beta=float('inf'),
-                            is_maximizing=False if state.last_player == self.max_player else True)
+            if self.workers > 1 and self.deterministic:
+                self.split_root(self.rootnode, state, is_maximizing)
+            elif self.workers > 1:
+                self.lazy_smp(self.rootnode, state, is_maximizing)
+            else:
+                self.alpha_beta(self.rootnode,
+                                state,
+                                self.depth,
+                                alpha=float('-inf'),
+                                beta=float('inf'),
+                                is_maximizing=is_maximizing)
         except BudgetExceededError:
             return self.fallback_mode(rootstate)
         
         return self.rootnode.best_move()["move"]
 
+    def lazy_smp(self, node: NodeMinimax, state: C4State, is_maximizing: bool):
+        """
+        Lazy SMP: helpers search the same root in the background with staggered depths and shuffled 
+        move ordering, filling the shared transposition table that the main search probes.
+        Only the main search is charged to the budget.
+        """
+        self.stop.value = 0
+        helpers = [self.get_pool().apply_async(_lazy_smp_helper, (state, self.depth + i % 2, self.max_player, self.budget, i,
+                                                            self.threat_pruning))
+                   for i in range(1, self.workers)]
+        try:
+            self.alpha_beta(node, state, self.depth, float('-inf'), float('inf'), is_maximizing)
+        finally:
+            self.stop.value = 1
+            self.helper_nodes = sum(helper.get() for helper in helpers)
+
+    def split_root(self, node: NodeMinimax, state: C4State, is_maximizing: bool):
+        """
+        Young Brothers Wait at the root: the first move is searched sequentially to get a bound,
+        then the remaining moves are searched in parallel with that bound.
+        Every subsearch is deterministic, so the chosen move does not depend on timing, and it is the move
+        of the sequential search; the younger brothers only know the eldest's bound, so more nodes are searched.
+        Nodes searched by all workers are charged to the budget.
+        """
+        if self.budget == 0:
+            raise BudgetExceededError("Minimax budget exceeded on recursive call!")
+        self.budget -= 1
+        self.nodes_per_depth[0] += 1
+
+        cmp_fn = max if is_maximizing else min
+        alpha, beta = float('-inf'), float('inf')
+        moves = state.get_possible_moves()
+
+        # eldest brother
+        state.make_move(moves[0])
+        child = node.add_child(moves[0])
+        best_util = self.alpha_beta(child, state, self.depth - 1, alpha, beta, not is_maximizing)
+        state.undo_move(moves[0])
+
+        if is_maximizing:
+            alpha = best_util
+        else:
+            beta = best_util
+        if beta <= alpha:
+            node.pruned = True
+            node.update(best_util)
+            return best_util
+
+        # younger brothers
+        tasks = [(state, move, self.depth - 1, self.max_player, alpha, beta, not is_maximizing, self.budget, self.threat_pruning)
+                 for move in moves[1:]]
+        results = self.get_pool().starmap(_search_child, tasks)
+
+        consumed = sum(result[2] for result in results)
+        if any(result[3] for result in results) or consumed > self.budget:
+            self.budget = 0
+            raise BudgetExceededError("Minimax budget exceeded on parallel search!")
+        self.budget -= consumed
+        for result in results:
+            for i, nodes in enumerate(result[4][:len(self.nodes_per_depth) - 1]):
+                self.nodes_per_depth[i + 1] += nodes
+
+        for util, child, _, _, _ in results:
+            child.parent = node
+            node.children.append(child)
+            # a brother that does not improve on the earlier ones would have been cut by the sequential
+            # search, which keeps the first of equal moves (searched with the eldest's bound, it may not be)
+            if cmp_fn(best_util, util) == best_util and child.children:
+                child.pruned = True
+            best_util = cmp_fn(best_util, util)
+            # the sequential search stops at a won move, the later brothers are left out
+            if best_util == (float('inf') if is_maximizing else float('-inf')):
+                node.pruned = True
+                break
+
+        node.update(best_util)
+        return best_util
+
+    def ponder(self, state: C4State):
+        """
+        Searches, in the background, the positions after the opponent's likely replies to our move
+        (best replies for the opponent first, according to our last search).
+        Finished searches are kept until our next move; only the one matching the actual reply is used.
+        """
+        if not self.pondering:
+            return
+
+        is_maximizing = False if state.last_player == self.max_player else True  # opponent's side
+        replies = state.get_possible_moves()
+        for child in self.rootnode.children:
+            if child.move == state.last_move and child.children:
+                utils = {c.move: c.util for c in child.children if c.util is not None}
+                replies.sort(key=lambda m: utils.get(m, 0), reverse=is_maximizing)
+
+        self.pondered = {}
+        self.ponder_nodes = 0
+        budget = self.ponder_budget if self.ponder_budget is not None else self.budget
+        base_state = state.copy()
+
+        def step():
+            if not replies:
+                return False
+            reply = replies.pop(0)
+            reply_state = base_state.copy()
+            reply_state.make_move(reply)
+            if reply_state.winner != 0 or not reply_state.get_possible_moves():
+                return True
+
+            searcher = Minimax(budget=budget, depth=self.depth, max_player=self.max_player, eval_cache=self.eval_cache,
+                               charge_cache_hits=self.charge_cache_hits, threat_pruning=self.threat_pruning)
+            searcher.stop = self.ponderer.flag
+            try:
+                searcher.alpha_beta(searcher.rootnode, reply_state, self.depth, float('-inf'), float('inf'), not is_maximizing)
+                self.pondered[reply_state.hash] = (searcher.rootnode, searcher.rootnode.best_move()["move"],
+                                                   budget - searcher.budget)
+            except BudgetExceededError:
+                pass
+            self.ponder_nodes += budget - searcher.budget
+            return True
+
+        self.ponderer.start(step)
+
+    def stop_pondering(self):
+        self.ponderer.stop()
+        self.ponder_work.append(self.ponder_nodes)
+        self.ponder_nodes = 0
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers, initializer=_init_worker,
+                                             initargs=(None if self.tt is None else self.tt.arrays, self.stop))
+        return self.pool
+
+    def close(self):
+        """
+        Terminates worker processes of parallel search (started again if the agent searches after).
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     def alpha_beta(self, 
                    node: NodeMinimax,
                    state: C4State, 
@@ -43,10 +256,15 @@ class Minimax:
                    is_maximizing: bool,
                    ):
         
+        if self.stop is not None and self.stop.value:
+            raise BudgetExceededError("Search stopped by the main search!")
+
         if self.budget == 0:
             raise BudgetExceededError("Minimax budget exceeded on recursive call!")
         
         self.budget -= 1
+        if self.depth - depth < len(self.nodes_per_depth):
+            self.nodes_per_depth[self.depth - depth] += 1
 
         if is_maximizing:
             cmp_fn = max
@@ -56,11 +274,55 @@ class Minimax:
             best_util = float('inf')
 
         if depth == 0 or state.winner != 0: # terminal state or maximum depth
-            util = evaluation_function(state, self.max_player)
+            util = self.evaluate(state)
             node.update(util)
             return util
 
-        for move in state.get_possible_moves():
+        # nobody can win anymore (the root is still searched to pick a move)
+        if node.parent is not None and state.is_dead_draw():
+            node.update(0)
+            return 0
+
+        moves = state.get_possible_moves()
+
+        # the root is never cut, its children are needed to pick the move
+        if self.threat_pruning and node.parent is not None:
+            util, moves = self.threat_moves(state, moves)
+            if util is not None:
+                node.update(util)
+                return util
+
+        if self.tt is not None:
+            key = cache_key(state, self.max_player)
+            alpha_orig, beta_orig = alpha, beta
+            entry = self.tt.probe(key)
+            if entry is not None:
+                value, entry_depth, flag, tt_move = entry
+                if node.parent is not None and entry_depth >= depth:
+                    if flag == EXACT:
+                        node.update(value)
+                        return value
+                    elif flag == LOWER:
+                        alpha = max(alpha, value)
+                    else:
+                        beta = min(beta, value)
+                    if beta <= alpha:
+                        node.pruned = True
+                        node.update(value)
+                        return value
+                # search the best move found so far first
+                if tt_move in moves:
+                    moves.remove(tt_move)
+                    moves.insert(0, tt_move)
+
+        if self.shuffle is not None:
+            first = moves[:1]
+            rest = moves[1:]
+            self.shuffle.shuffle(rest)
+            moves = first + rest
+
+        best_move = None
+        for move in moves:
                 
             state.make_move(move)
             child = node.add_child(move)
@@ -76,6 +338,8 @@ class Minimax:
             )
 
             # updating best utility
+            if best_move is None or cmp_fn(best_util, util) != best_util:
+                best_move = move
             best_util = cmp_fn(best_util, util)
             
             # undoing move
@@ -94,8 +358,56 @@ class Minimax:
 
         node.update(best_util)
 
+        if self.tt is not None:
+            if best_util <= alpha_orig:
+                flag = UPPER
+            elif best_util >= beta_orig:
+                flag = LOWER
+            else:
+                flag = EXACT
+            self.tt.store(key, best_util, depth, flag, best_move)
+
         return best_util
     
+    def threat_moves(self, state: C4State, moves: list):
+        """
+        Immediate-threat detection for the side to move.
+
+        Returns:
+        (float, list): Value of the node if it is decided (an immediate win, or two opponent threats
+        that cannot both be blocked), None otherwise; and the moves worth searching
+        (only the block if the opponent has exactly one threat).
+        """
+        player = 3 - state.last_player
+        win = float('inf') if player == self.max_player else float('-inf')
+
+        if state.winning_moves(player):
+            return win, []
+
+        threats = state.winning_moves(state.last_player)
+        if len(threats) > 1:
+            return -win, []
+        if len(threats) == 1:
+            return None, threats
+        return None, moves
+
+    def evaluate(self, state: C4State):
+        """
+        Heuristic value of a leaf, looked up in the evaluation cache when there is one.
+        """
+        if self.eval_cache is None:
+            return evaluation_function(state, self.max_player)
+
+        key = cache_key(state, self.max_player)
+        util = self.eval_cache.get(key)
+        if util is None:
+            util = evaluation_function(state, self.max_player)
+            self.eval_cache.put(key, util)
+        elif not self.charge_cache_hits:
+            self.budget += 1    # refund the evaluation charged on entry to alpha_beta
+
+        return util
+
     def fallback_mode(self, state: C4State):
         """
         Function called once the computational budget is exhausted (AKA: no more evaluations left).
@@ -118,4 +430,49 @@ class Minimax:
         # no possible moves left
         # unreacheable
         raise BudgetExceededError("Minimax ran out of computational budget!")
-        
\ No newline at end of file
+        
+
+# parallel search workers (module level so that they can be sent to worker processes)
+
+_worker_tt = None
+_worker_stop = None
+
+def _init_worker(tt_arrays, stop):
+    global _worker_tt, _worker_stop
+    _worker_tt = None if tt_arrays is None else SharedTT(len(tt_arrays[0]), tt_arrays)
+    _worker_stop = stop
+
+def _lazy_smp_helper(state: C4State, depth: int, max_player: int, budget: int, worker_id: int,
+                     threat_pruning: bool=False):
+    """
+    Lazy SMP helper: iterative deepening from the root until the main search finishes.
+    Returns the number of nodes searched.
+    """
+    helper = Minimax(budget=budget, depth=depth, max_player=max_player, threat_pruning=threat_pruning)
+    helper.tt = _worker_tt
+    helper.stop = _worker_stop
+    helper.shuffle = random.Random(worker_id)
+    is_maximizing = False if state.last_player == max_player else True
+    try:
+        for d in range(1, depth + 1):
+            helper.alpha_beta(NodeMinimax(), state.copy(), d, float('-inf'), float('inf'), is_maximizing)
+    except BudgetExceededError:
+        pass
+    return budget - helper.budget
+
+def _search_child(state: C4State, move: int, depth: int, max_player: int, alpha: float, beta: float,
+                  is_maximizing: bool, budget: int, threat_pruning: bool=False):
+    """
+    Searches the subtree of one root move.
+    Returns (util, child node, nodes searched, budget exceeded, nodes searched at each ply below the root).
+    """
+    searcher = Minimax(budget=budget, depth=depth, max_player=max_player, threat_pruning=threat_pruning)
+    state = state.copy()
+    state.make_move(move)
+    # the parent stands in for the root (kept by the main search), so the child is cut as in a sequential search
+    child = NodeMinimax(move=move, parent=NodeMinimax())
+    try:
+        util = searcher.alpha_beta(child, state, depth, alpha, beta, is_maximizing)
+    except BudgetExceededError:
+        return None, child, budget - searcher.budget, True, searcher.nodes_per_depth
+    return util, child, budget - searcher.budget, False, searcher.nodes_per_depth
@@ -41,6 +41,8 @@ class NodeMCTS(Node):
         super().__init__(move, parent)
         self.wins = 0
         self.visits = 0
+        self.amaf_wins = 0      # all-moves-as-first statistics (RAVE)
+        self.amaf_visits = 0
         self.last_player = state.last_player  # 1 or 2 (to check which player won)
         self.untried_moves = state.get_possible_moves()  # future children
 
@@ -57,10 +59,24 @@ class NodeMCTS(Node):
         self.visits += 1
         self.wins += result
 
+    def update_amaf(self, result):
+        """
+        Updates AMAF statistics with the result of a rollout in which this node's move was played.
+        """
+        self.amaf_visits += 1
+        self.amaf_wins += result
+
     def best_move(self):
         child = sorted(self.children, key=lambda c: c.wins / c.visits)[-1]
         return {"move": child.move, "node": child}
 
+    def most_visited(self):
+        """
+        Robust child selection: the child with the highest visit count.
+        """
+        child = sorted(self.children, key=lambda c: c.visits)[-1]
+        return {"move": child.move, "node": child}
+
     def add_child(self, move, state):
         """
         Adds a new child node of type NodeMinimax to this node.
@@ -70,6 +86,63 @@ class NodeMCTS(Node):
         self.children.append(child)
         return child
 
+    def edges(self):
+        """
+        (move, child) pairs of this node.
+        """
+        return [(child.move, child) for child in self.children]
+
+class NodeMCTS_TT(NodeMCTS):
+    """
+    MCTS node shared between transpositions.
+    A node can be reached from several parents (the search graph is a DAG), 
+    so the move leading to each child is stored on the edge instead of the child.
+    """
+
+    def __init__(self, 
+                 move: int=None, 
+                 parent=None, 
+                 state: C4State=None
+                 ):
+        super().__init__(move, parent, state)
+        self.moves = []     # moves[i] leads to children[i]
+        self.parents = [parent] if parent is not None else []   # every node linking to this one
+        self.hash = state.hash
+
+    def best_move(self):
+        move, child = sorted(self.edges(), key=lambda e: e[1].wins / e[1].visits)[-1]
+        return {"move": move, "node": child}
+
+    def most_visited(self):
+        move, child = sorted(self.edges(), key=lambda e: e[1].visits)[-1]
+        return {"move": move, "node": child}
+
+    def add_child(self, move, state, child=None):
+        """
+        Links a child to this node, creating a new NodeMCTS_TT unless an existing node is given.
+        """
+        if child is None:
+            child = NodeMCTS_TT(move=move, parent=self, state=state)
+        else:
+            child.parents.append(self)
+        self.untried_moves.remove(move)
+        self.children.append(child)
+        self.moves.append(move)
+        return child
+
+    def edges(self):
+        return list(zip(self.moves, self.children))
+
+    def unlink(self):
+        """
+        Removes this node from every parent, whose move leading to it becomes untried again.
+        """
+        for parent in self.parents:
+            i = parent.children.index(self)
+            parent.untried_moves.append(parent.moves.pop(i))
+            parent.children.pop(i)
+        self.parents = []
+
 class NodeMinimax(Node):
     """ 
     Minimax node.
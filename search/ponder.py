@@ -0,0 +1,50 @@
+import threading
+
+class StopFlag(object):
+    """
+    Flag polled by searches running in the background (same interface as a shared multiprocessing value).
+    """
+    def __init__(self):
+        self.value = 0
+
+class Ponderer(object):
+    """
+    Runs a search step repeatedly in a background thread while the opponent is thinking.
+    The step returns False once there is nothing left to do.
+
+    Note that threads share the interpreter lock: pondering only lowers latency when
+    the opponent does not think in the same process (e.g. a human player or another process).
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.flag = StopFlag()
+        self.steps = 0
+
+    def start(self, step):
+        self.stop()
+        self.flag = StopFlag()
+        self.steps = 0
+
+        def run():
+            while not self.flag.value:
+                if step() is False:
+                    break
+                self.steps += 1
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops the background search and returns the number of steps it completed.
+        """
+        if self.thread is None:
+            return 0
+        self.flag.value = 1
+        self.thread.join()
+        self.thread = None
+        return self.steps
+
+    def is_running(self):
+        return self.thread is not None
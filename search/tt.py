@@ -0,0 +1,58 @@
+import numpy as np
+from multiprocessing import RawArray
+
+EXACT, LOWER, UPPER = 0, 1, 2   # kind of bound stored with a value
+
+class SharedTT(object):
+    """
+    Fixed-size transposition table in shared memory, used by parallel Minimax workers.
+
+    It is lock-free: the key is stored XORed with the packed entry (value, depth, flag and move),
+    and a reader only trusts an entry if unpacking the key with the fields it read gives its key back.
+    An entry torn by writers hitting the same slot at once is then rejected as a miss, unless the
+    mixed fields happen to XOR to the same bits (as unlikely as a 64-bit key collision).
+    Slots are always replaced (no depth-preferred scheme).
+    """
+
+    def __init__(self, size: int=2**20, arrays: tuple=None):
+        self.size = size
+        # shared buffers, passed to worker processes at creation (see arrays)
+        self.raw = arrays if arrays is not None else (
+            RawArray("Q", size), RawArray("d", size), RawArray("b", size), RawArray("b", size), RawArray("b", size))
+
+        self.keys = np.frombuffer(self.raw[0], dtype=np.uint64)
+        self.values = np.frombuffer(self.raw[1], dtype=np.float64)
+        self.depths = np.frombuffer(self.raw[2], dtype=np.int8)
+        self.flags = np.frombuffer(self.raw[3], dtype=np.int8)
+        self.moves = np.frombuffer(self.raw[4], dtype=np.int8)
+
+    @property
+    def arrays(self):
+        return self.raw
+
+    def probe(self, key: int):
+        """
+        (value, depth, flag, move) stored for key, None if missing.
+        """
+        i = key % self.size
+        check = int(self.keys[i])
+        entry = (float(self.values[i]), int(self.depths[i]), int(self.flags[i]), int(self.moves[i]))
+        if check ^ _pack(*entry) != key:
+            return None
+        return entry
+
+    def store(self, key: int, value: float, depth: int, flag: int, move: int):
+        i = key % self.size
+        move = -1 if move is None else move
+        self.values[i] = value
+        self.depths[i] = depth
+        self.flags[i] = flag
+        self.moves[i] = move
+        self.keys[i] = key ^ _pack(float(self.values[i]), depth, flag, move)
+
+    def clear(self):
+        self.keys[:] = 0
+
+def _pack(value: float, depth: int, flag: int, move: int):
+    # the bits of an entry, folded into 64 bits to check it against its key
+    return int(np.float64(value).view(np.uint64)) ^ (depth & 0xff) ^ (flag & 0xff) << 8 ^ (move & 0xff) << 16
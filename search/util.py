@@ -1,4 +1,6 @@
+import numpy as np
 from c4.state import C4State
+from c4.geometry import get_geometry
 
 class BudgetExceededError(Exception):
     """
@@ -6,6 +8,34 @@ class BudgetExceededError(Exception):
     """
     pass
 
+class RandomBuffer(object):
+    """
+    Uniform random draws served from a buffer that is refilled in bulk from an explicit generator.
+    Each agent owns one, so its stream does not depend on other agents or on scheduling order.
+    """
+
+    def __init__(self, 
+                 rng: np.random.Generator=None, 
+                 size: int=4096
+                 ):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.size = size
+        self.buffer = []
+        self.pos = 0
+
+    def random(self):
+        """
+        Float in [0, 1).
+        """
+        if self.pos == len(self.buffer):
+            self.buffer = self.rng.random(self.size).tolist()
+            self.pos = 0
+        self.pos += 1
+        return self.buffer[self.pos - 1]
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
 def get_column_weights(cols):
     center = cols // 2
     weights = [0] * cols
@@ -50,56 +80,45 @@ def evaluation_function(state: C4State, max_player: int):
     
     return in_favour - against
 
-def count_spaces_available(x, y, dx, dy, state: C4State):
+def count_spaces_available(rays: np.array, available: np.array):
     """
-    Count free spaces immediately available in a given direction.
+    Count free spaces immediately available along each ray (one ray per row).
     """
-    count = 0
-    while state.available_immediately(x, y):
-        count += 1
-        x += dx
-        y += dy
-    return count
+    return np.cumprod(available[rays], axis=1).sum(axis=1)
 
 def feature_2(state: C4State, player):
-    coord_dict = state.find_sequence(state.connect-1, player)
-    util = 0
-    for direction, coords in coord_dict.items():
-        dx, dy = state.directions[direction]
-        for ((x_s, y_s), (x_e, y_e)) in coords:
-            count = 0
-            if state.available_immediately(x_s-dx, y_s-dy):      # check
-                count += 1                                              # both
-            if state.available_immediately(x_e+dx, y_e+dy):      # sides
-                count += 1                                              # of sequence
-            
-            if count == 2:
-                return float('inf')
-            elif count == 1:
-                util = 900000 
-    return util
+    geometry = get_geometry(state.rows, state.cols, state.connect-1)
+    pure = geometry.pure_matches(state.board, player)
+    if not pure.any():
+        return 0
+
+    # free spaces immediately available at both sides of each sequence
+    available = state.available_mask()
+    count = available[geometry.before[pure]].astype(int) + available[geometry.after[pure]]
+
+    if (count == 2).any():
+        return float('inf')
+    elif (count == 1).any():
+        return 900000
+    return 0
 
 def feature_3(state: C4State, player):
-    coord_dict = state.find_sequence(state.connect-2, player)
-    util = 0
-    for direction, coords in coord_dict.items():
-        dx, dy = state.directions[direction]
-        for ((x_s, y_s), (x_e, y_e)) in coords:
-            
-            start_spaces = count_spaces_available(x_s, y_s, -dx, -dy, state)
-            end_spaces = count_spaces_available(x_e, y_e, +dx, +dy, state)
-
-            if start_spaces != 0 and end_spaces != 0:
-                return 50000
-            util = (max(max(start_spaces, end_spaces)-1, 0)) * 10000 
-            
-    return util
+    geometry = get_geometry(state.rows, state.cols, state.connect-2)
+    pure = geometry.pure_matches(state.board, player)
+    if not pure.any():
+        return 0
+
+    available = state.available_mask()
+    start_spaces = count_spaces_available(geometry.back_rays[pure], available)
+    end_spaces = count_spaces_available(geometry.forward_rays[pure], available)
+
+    if ((start_spaces != 0) & (end_spaces != 0)).any():
+        return 50000
+    # last sequence found determines the utility
+    return int(max(max(start_spaces[-1], end_spaces[-1])-1, 0)) * 10000
 
 def feature_4(state: C4State, player):
-    column_weights = get_column_weights(state.cols)
-    coord_dict = state.find_sequence(1, player)
-    util = 0
-    for _, coords in coord_dict.items():
-        for coord in coords:
-            util += column_weights[coord[0][1]]
-    return util
\ No newline at end of file
+    column_weights = np.array(get_column_weights(state.cols))
+    geometry = get_geometry(state.rows, state.cols, 1)
+    pure = geometry.pure_matches(state.board, player)
+    return int(column_weights[geometry.starts[pure, 1]].sum())
@@ -0,0 +1,116 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+from sim.schema import open_moves
+
+AGENTS = ["minimax", "mcts"]
+
+# attributes shared by every move of a game
+GAME_KEYS = ["depth", "budget_total", "mcts_strategy", "agent_start", "connect", "bf"]
+
+# per-move columns needed to summarise games
+MOVE_COLUMNS = ["sim_id", "move_id", "ms", "agent_curr", "is_win", "budget_exceeded"] + GAME_KEYS
+
+def summarize_games(sims: pd.DataFrame):
+    """
+    One pass over per-move rows, giving one row per game:
+    configuration, number of moves, winner (is_win) and moves to win, forfeiting agent,
+    adjusted outcome (Minimax wins or MCTS exceeds its budget) and time per move of each agent.
+    """
+    # dictionary-encoded columns (see sim/schema.py) are summarised as plain strings
+    sims = sims.astype({column: str for column in sims.columns if isinstance(sims[column].dtype, pd.CategoricalDtype)})
+    by_game = sims.groupby("sim_id", sort=True)
+    games = by_game[[key for key in GAME_KEYS if key in sims.columns]].first()
+    for key in GAME_KEYS:
+        if key not in games.columns:    # attributes not recorded by older simulations
+            games[key] = np.nan
+    games["n_moves"] = by_game.size()
+
+    wins = sims[sims["is_win"]].drop_duplicates("sim_id").set_index("sim_id")
+    games["winner"] = wins["agent_curr"]
+    games["moves_to_win"] = wins["move_id"]
+
+    forfeits = sims[sims["budget_exceeded"]].drop_duplicates("sim_id").set_index("sim_id")
+    games["forfeit"] = forfeits["agent_curr"]
+
+    games["mm_win"] = (games["winner"] == "minimax") | (games["forfeit"] == "mcts")
+
+    # moves without a time (memory measured) are not counted in n_moves_<agent>, the ms_mean_<agent> divisor
+    latency = sims.groupby(["sim_id", "agent_curr"])["ms"].agg(["sum", "max", "count"]).unstack("agent_curr")
+    for agent in AGENTS:
+        for stat in ["sum", "max", "count"]:
+            values = latency[(stat, agent)] if (stat, agent) in latency.columns else 0
+            games[f"ms_{stat}_{agent}" if stat != "count" else f"n_moves_{agent}"] = values
+
+    return games.reset_index()
+
+def summarize_configs(games: pd.DataFrame):
+    """
+    Additive per-configuration totals of game summaries (see rollup for rates and means).
+    """
+    games = games.assign(
+        n_games=1,
+        mm_wins=games["mm_win"].astype(int),
+        **{f"wins_{agent}": (games["winner"] == agent).astype(int) for agent in AGENTS},
+        **{f"forfeits_{agent}": (games["forfeit"] == agent).astype(int) for agent in AGENTS},
+        **{f"moves_to_win_{agent}": games["moves_to_win"].where(games["winner"] == agent, 0) for agent in AGENTS})
+
+    totals = [column for column in games.columns if column.startswith(("n_games", "mm_wins", "wins_", "forfeits_",
+                                                                       "moves_to_win_", "ms_sum_", "n_moves_"))]
+    maxima = [column for column in games.columns if column.startswith("ms_max_")]
+
+    grouped = games.groupby(GAME_KEYS, dropna=False)
+    return pd.concat([grouped[totals].sum(), grouped[maxima].max()], axis=1).reset_index()
+
+def rollup(configs: pd.DataFrame, by: list):
+    """
+    Config summaries merged over the given keys, with derived win rate,
+    mean moves to win and mean time per move of each agent.
+    """
+    grouped = configs.groupby(by, dropna=False)
+    maxima = [column for column in configs.columns if column.startswith("ms_max_")]
+    totals = [column for column in configs.columns if column not in GAME_KEYS and column not in maxima]
+    summary = pd.concat([grouped[totals].sum(), grouped[maxima].max()], axis=1).reset_index()
+
+    summary["win_rate"] = summary["mm_wins"] / summary["n_games"]
+    for agent in AGENTS:
+        summary[f"mean_moves_to_win_{agent}"] = summary[f"moves_to_win_{agent}"] / summary[f"wins_{agent}"].replace(0, np.nan)
+        summary[f"ms_mean_{agent}"] = summary[f"ms_sum_{agent}"] / summary[f"n_moves_{agent}"].replace(0, np.nan)
+    return summary
+
+def summary_paths(path_to_table: str):
+    base = os.path.splitext(path_to_table)[0]
+    return base + ".games.parquet", base + ".configs.parquet"
+
+def load_summaries(path_to_table: str):
+    """
+    Game and config summaries of a per-move table, kept next to it and updated incrementally:
+    only games missing from the cached summaries are read (the whole table is summarised
+    again if it no longer contains some cached game, e.g. after being overwritten).
+
+    Returns:
+    (pd.DataFrame, pd.DataFrame): Game summaries and config summaries.
+    """
+    games_path, configs_path = summary_paths(path_to_table)
+
+    moves = open_moves(path_to_table)
+    sim_ids = moves.to_table(columns=["sim_id"]).column("sim_id").to_numpy()
+    cached = pd.read_parquet(games_path) if os.path.exists(games_path) else None
+    if cached is not None and not np.isin(cached["sim_id"].to_numpy(), sim_ids).all():
+        cached = None
+
+    new_ids = np.unique(sim_ids) if cached is None else np.setdiff1d(sim_ids, cached["sim_id"].to_numpy())
+    if cached is not None and len(new_ids) == 0:
+        configs = pd.read_parquet(configs_path) if os.path.exists(configs_path) else summarize_configs(cached)
+        return cached, configs
+
+    columns = [column for column in MOVE_COLUMNS if column in moves.schema.names]
+    filter = None if cached is None else ds.field("sim_id").isin(new_ids)
+    new_games = summarize_games(moves.to_table(columns=columns, filter=filter).to_pandas())
+
+    games = new_games if cached is None else pd.concat([cached, new_games], ignore_index=True)
+    configs = summarize_configs(games)
+    games.to_parquet(games_path, index=False)
+    configs.to_parquet(configs_path, index=False)
+    return games, configs
@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+from itertools import product
+from sim.collect_data import play_config, _play_config_worker
+from sim.scheduler import CostModel, run_scheduled
+from sim.schema import write_moves, remove_moves, compact_moves
+
+# keys of a pairing: a Minimax and an MCTS agent at the same budget, on a board (colours alternate).
+# Pairings are restricted to that on purpose: games are played by run_simulation, the game of the
+# experiment (Minimax against MCTS under one shared budget), so that arena games are the same
+# rows as the sweeps and can be aggregated with them. Other matchups (Minimax against Minimax,
+# unequal budgets) would need their own game loop and per-agent budgets in the moves schema.
+PAIRING_KEYS = ["budget", "mcts_strat", "mm_depth", "rows", "cols", "connect"]
+
+def elo_to_score(elo: float):
+    """
+    Expected score of a player rated elo points above its opponent.
+    """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def score_to_elo(score: float):
+    return -400 * np.log10(1 / score - 1)
+
+def game_score(game: pd.DataFrame):
+    """
+    Score of Minimax in a game played by run_simulation: 1 win, 0 loss, 0.5 draw.
+    A player exceeding its budget loses the game.
+    """
+    wins = game[game["is_win"]]
+    if len(wins):
+        return 1.0 if wins["agent_curr"].iloc[0] == "minimax" else 0.0
+    forfeits = game[game["budget_exceeded"]]
+    if len(forfeits):
+        return 0.0 if forfeits["agent_curr"].iloc[0] == "minimax" else 1.0
+    return 0.5
+
+class SPRT(object):
+    """
+    Sequential probability ratio test on the Elo difference of Minimax over MCTS,
+    H0: elo = -margin against H1: elo = +margin, with error rates alpha and beta.
+
+    The log-likelihood ratio uses the normal approximation of the game scores (wins, draws, losses).
+    Half a win and half a loss are added to the counts, so that one-sided results have a finite variance.
+    """
+
+    def __init__(self, margin: float=100, alpha: float=0.05, beta: float=0.05):
+        self.margin = margin
+        self.lower = np.log(beta / (1 - alpha))
+        self.upper = np.log((1 - beta) / alpha)
+
+    def llr(self, wins: int, draws: int, losses: int):
+        wins, losses = wins + 0.5, losses + 0.5
+        n = wins + draws + losses
+        score = (wins + draws / 2) / n
+        var = (wins + draws / 4) / n - score ** 2
+        s0, s1 = elo_to_score(-self.margin), elo_to_score(self.margin)
+        return n * (s1 - s0) * (2 * score - s0 - s1) / (2 * var)
+
+    def decide(self, wins: int, draws: int, losses: int):
+        """
+        "minimax" (H1 accepted), "mcts" (H0 accepted) or None while undecided.
+        """
+        llr = self.llr(wins, draws, losses)
+        if llr >= self.upper:
+            return "minimax"
+        if llr <= self.lower:
+            return "mcts"
+        return None
+
+def player_names(pairing: dict):
+    """
+    Rating names of the two agents of a pairing (budget and board are part of an agent).
+    """
+    suffix = f"b{pairing['budget']} {pairing['cols']}c{pairing['connect']}"
+    return f"minimax d{pairing['mm_depth']} {suffix}", f"mcts {pairing['mcts_strat']} {suffix}"
+
+def fit_ratings(results: pd.DataFrame, prior_draws: float=1.0):
+    """
+    Bradley-Terry (BayesElo-like) ratings of the players of finished pairings.
+
+    Draws count as half a win for each side, and every pairing gets prior_draws virtual draws,
+    so that unbeaten players keep a finite rating. Ratings are fitted with minorization-maximization
+    and centred on 0; they are only comparable between players connected by games (same budget and board).
+
+    Parameters:
+    results (pd.DataFrame): One row per pairing with columns minimax, mcts (player names), wins, draws, losses
+                            (counts of Minimax).
+
+    Returns:
+    (pd.DataFrame): player, elo and games, best first.
+    """
+    players = sorted(set(results["minimax"]) | set(results["mcts"]))
+    index = {player: i for i, player in enumerate(players)}
+    a = results["minimax"].map(index).to_numpy()
+    b = results["mcts"].map(index).to_numpy()
+    draws = results["draws"].to_numpy() + prior_draws
+    wins_a = results["wins"].to_numpy() + draws / 2
+    wins_b = results["losses"].to_numpy() + draws / 2
+    games = wins_a + wins_b
+
+    scores = np.bincount(a, wins_a, len(players)) + np.bincount(b, wins_b, len(players))
+    strength = np.ones(len(players))
+    for _ in range(1000):
+        rate = games / (strength[a] + strength[b])
+        updated = scores / (np.bincount(a, rate, len(players)) + np.bincount(b, rate, len(players)))
+        updated /= np.exp(np.log(updated).mean())
+        if np.allclose(updated, strength, rtol=1e-9):
+            break
+        strength = updated
+
+    elo = 400 * np.log10(strength)
+    n_games = np.bincount(a, games - prior_draws, len(players)) + np.bincount(b, games - prior_draws, len(players))
+    ratings = pd.DataFrame({"player": players, "elo": elo - elo.mean(), "games": n_games.astype(int)})
+    return ratings.sort_values("elo", ascending=False, ignore_index=True)
+
+def play_games(configs: list, sim_ids: list, base_seed: int, workers: int=1, model: CostModel=None):
+    """
+    Plays one game per configuration (see run_configs), on a pool of workers if more than one.
+    Returns the per-move DataFrames of the games, in the order of configs.
+    """
+    if workers > 1:
+        tasks = [(config, sim_id, base_seed, None, False) for config, sim_id in zip(configs, sim_ids)]
+        games = dict(run_scheduled(_play_config_worker, tasks, configs, workers, model))
+        return [games[i] for i in range(len(configs))]
+    return [play_config(config, sim_id, base_seed) for config, sim_id in zip(configs, sim_ids)]
+
+def grid_pairings(budgets: list, strats: list, depths, shapes: list=None):
+    """
+    Pairings of every budget, MCTS strategy, Minimax depth and board shape (rows, cols, connect; connect 4 by default).
+    depths is a list, or a dict of budget to depth (e.g. the best depths).
+    """
+    shapes = shapes if shapes is not None else [(6, 7, 4)]
+    pairings = []
+    for budget, strat, (rows, cols, connect) in product(budgets, strats, shapes):
+        for depth in ([depths[budget]] if isinstance(depths, dict) else depths):
+            pairings.append({"budget": budget, "mcts_strat": strat, "mm_depth": depth,
+                             "rows": rows, "cols": cols, "connect": connect})
+    return pairings
+
+def run_arena(pairings: list,
+              file_name: str,
+              base_seed: int=42,
+              sprt: SPRT=None,
+              min_games: int=4,
+              max_games: int=100,
+              workers: int=1
+              ):
+    """
+    Plays every pairing until its SPRT is decided (or max_games are played), in rounds:
+    each round plays an even number of games of every undecided pairing, colours alternating.
+
+    A pairing is a Minimax depth against an MCTS strategy at the same budget (see PAIRING_KEYS):
+    the SPRT answers the question of the sweeps, whether Minimax beats MCTS for a given budget.
+    Ratings of players that never meet at a budget are not comparable (see fit_ratings).
+
+    Games get consecutive sim ids, are seeded with base_seed + sim id and written to the moves
+    dataset file_name (replaced), in the per-move layout of run_simulation.
+
+    Returns:
+    (pd.DataFrame, pd.DataFrame): One row per pairing (counts, LLR, decision) and the ratings of the players.
+    """
+    sprt = sprt if sprt is not None else SPRT()
+    remove_moves(file_name)
+
+    counts = np.zeros((len(pairings), 3), dtype=np.int64)     # Minimax wins, draws, losses
+    decisions = [None] * len(pairings)
+    live = list(range(len(pairings)))
+    model = CostModel()
+    sim_id = 0
+
+    while live:
+        per_round = max(2, 2 * -(-workers // (2 * len(live))))  # keep every worker busy, both colours
+        configs, owners = [], []
+        for p in live:
+            for g in range(min(per_round, max_games - counts[p].sum())):
+                is_mm_p1 = (counts[p].sum() + g) % 2 == 0
+                configs.append({**pairings[p], "is_mm_p1": is_mm_p1})
+                owners.append(p)
+        sim_ids = list(range(sim_id, sim_id + len(configs)))
+        sim_id += len(configs)
+
+        games = play_games(configs, sim_ids, base_seed, workers, model)
+        write_moves(pd.concat(games, ignore_index=True), file_name)
+        for p, game in zip(owners, games):
+            counts[p, {1.0: 0, 0.5: 1, 0.0: 2}[game_score(game)]] += 1
+
+        for p in live:
+            if counts[p].sum() >= min_games:
+                decisions[p] = sprt.decide(*counts[p])
+        live = [p for p in live if decisions[p] is None and counts[p].sum() < max_games]
+
+    compact_moves(file_name)
+
+    results = pd.DataFrame(pairings, columns=PAIRING_KEYS)
+    results["minimax"], results["mcts"] = zip(*[player_names(pairing) for pairing in pairings])
+    results["games"] = counts.sum(axis=1)
+    results["wins"], results["draws"], results["losses"] = counts.T
+    results["score"] = (results["wins"] + results["draws"] / 2) / results["games"]
+    # Elo difference of Minimax, with the half win and half loss of the SPRT (finite for one-sided results)
+    results["elo"] = ((results["wins"] + results["draws"] / 2 + 0.5) / (results["games"] + 1)).map(score_to_elo)
+    results["llr"] = [sprt.llr(*c) for c in counts]
+    results["decision"] = [d if d is not None else "undecided" for d in decisions]
+
+    return results, fit_ratings(results)
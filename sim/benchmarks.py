@@ -0,0 +1,166 @@
+import time
+from numpy.random import default_rng
+from c4.state import C4State
+from search.minimax import Minimax
+from search.mcts import MCTS_UCT
+
+# standard positions: (rows, cols, connect, moves played from the empty board)
+STANDARD_POSITIONS = [
+    (6, 7, 4, []),
+    (6, 7, 4, [3, 3, 2, 4]),
+    (6, 7, 4, [3, 2, 3, 3, 4, 1, 5]),
+    (7, 8, 5, [4, 3, 4, 4]),
+]
+
+# board shapes (rows, cols, connect) played in the simulation sweeps
+SWEEP_SHAPES = [(6, 7, 4), (5, 6, 3), (7, 8, 5), (8, 9, 6), (9, 10, 7)]
+
+def make_position(rows: int, cols: int, connect: int, moves: list):
+    state = C4State(rows=rows, cols=cols, connect=connect)
+    for move in moves:
+        state.make_move(move)
+    return state
+
+def bench_parallel_minimax(workers: tuple=(1, 2, 4), depth: int=5, budget: int=10**7, repeats: int=3):
+    """
+    Speedup of parallel Minimax against the sequential search on the standard positions.
+    Both parallel modes (Lazy SMP and deterministic root splitting) are measured.
+
+    Returns:
+    (list): One dict per (mode, workers) with the mean time per search and the speedup.
+    """
+    results = []
+    baseline = None
+    for n_workers in workers:
+        modes = [("sequential", False)] if n_workers == 1 else [("lazy_smp", False), ("split_root", True)]
+        for mode, deterministic in modes:
+            agent = Minimax(budget=budget, depth=depth, max_player=1, workers=n_workers, deterministic=deterministic)
+            if n_workers > 1:
+                agent.get_pool()    # worker start-up is not part of the search time
+
+            elapsed = 0
+            nodes = 0
+            moves = []
+            for rows, cols, connect, played in STANDARD_POSITIONS:
+                state = make_position(rows, cols, connect, played)
+                agent.max_player = 3 - state.last_player
+                for _ in range(repeats):
+                    agent.budget = budget
+                    if agent.tt is not None:
+                        agent.tt.clear()
+                    start = time.perf_counter()
+                    moves.append(agent.pick_move(state))
+                    elapsed += time.perf_counter() - start
+                    nodes += budget - agent.budget
+            agent.close()
+
+            ms = elapsed / (len(STANDARD_POSITIONS) * repeats) * 1000
+            if baseline is None:
+                baseline = ms
+            results.append({"mode": mode, "workers": n_workers, "ms": ms, "speedup": baseline / ms,
+                            "nodes": nodes, "moves": moves})
+            print(f"{mode:>10} | workers: {n_workers} | {ms:8.1f} ms/search | speedup: {baseline / ms:4.2f}x")
+
+    return results
+
+def bench_rollout_length(shapes: list=SWEEP_SHAPES, n_rollouts: int=1000, seed: int=42):
+    """
+    Average MCTS rollout length from the empty board, with and without stopping at dead draws.
+    Each truncated rollout is played on to the end with the same random moves,
+    so both lengths are measured on the same games.
+
+    Returns:
+    (list): One dict per board shape with both mean lengths and the share of truncated rollouts.
+    """
+    results = []
+    for rows, cols, connect in shapes:
+        agent = MCTS_UCT(budget=1, strategy="greedy", spaces=rows*cols, rng=default_rng(seed))
+        full, truncated, n_dead = 0, 0, 0
+        for _ in range(n_rollouts):
+            state = C4State(rows=rows, cols=cols, connect=connect)
+            n_moves = len(agent.rollout(state))
+            truncated += n_moves
+            n_dead += state.is_dead_draw()
+
+            moves = state.get_possible_moves()
+            while moves != []:
+                state.make_move(agent.random.choice(moves))
+                n_moves += 1
+                moves = state.get_possible_moves()
+            full += n_moves
+
+        results.append({"shape": (rows, cols, connect), "before": full / n_rollouts,
+                        "after": truncated / n_rollouts, "dead_draws": n_dead / n_rollouts})
+        print(f"{rows}x{cols} connect {connect} | before: {full / n_rollouts:5.1f} moves "
+              f"| after: {truncated / n_rollouts:5.1f} moves | dead draws: {n_dead / n_rollouts:.1%}")
+
+    return results
+
+def bench_threat_pruning(depth: int=5, budget: int=10**7):
+    """
+    Nodes searched at each ply on the standard positions, with and without threat pruning.
+
+    Returns:
+    (dict): Node counts per ply (summed over the positions) for each setting, and the moves picked.
+    """
+    results = {}
+    for threat_pruning in (False, True):
+        agent = Minimax(budget=budget, depth=depth, max_player=1, threat_pruning=threat_pruning)
+        nodes_per_depth = [0] * (depth + 1)
+        moves = []
+        start = time.perf_counter()
+        for rows, cols, connect, played in STANDARD_POSITIONS:
+            state = make_position(rows, cols, connect, played)
+            agent.max_player = 3 - state.last_player
+            agent.budget = budget
+            moves.append(agent.pick_move(state))
+            nodes_per_depth = [n + m for n, m in zip(nodes_per_depth, agent.nodes_per_depth)]
+        ms = (time.perf_counter() - start) * 1000
+
+        results[threat_pruning] = {"nodes_per_depth": nodes_per_depth, "ms": ms, "moves": moves}
+        print(f"threat pruning: {str(threat_pruning):>5} | nodes per ply: {nodes_per_depth} "
+              f"| total: {sum(nodes_per_depth)} | {ms:8.1f} ms")
+
+    return results
+
+def bench_render(shapes: list=SWEEP_SHAPES, n_games: int=20, seed: int=42):
+    """
+    Frames per second of C4Visual (offscreen) on random games, redrawing the whole board
+    on every frame against redrawing only the changed cells.
+
+    Returns:
+    (list): One dict per board shape with the frames per second of both modes.
+    """
+    from c4.visual import C4Visual
+
+    results = []
+    rng = default_rng(seed)
+    for rows, cols, connect in shapes:
+        games = []
+        for _ in range(n_games):
+            state = C4State(rows=rows, cols=cols, connect=connect)
+            moves = []
+            while state.get_possible_moves():
+                moves.append(int(rng.choice(state.get_possible_moves())))
+                state.make_move(moves[-1])
+            games.append(moves)
+
+        fps = {}
+        for full in (True, False):
+            n_frames, elapsed = 0, 0
+            for moves in games:
+                state = C4State(rows=rows, cols=cols, connect=connect)
+                visual = C4Visual(state, headless=True)
+                start = time.perf_counter()
+                visual.render(full=full)
+                for move in moves:
+                    state.make_move(move)
+                    visual.render(full=full)
+                elapsed += time.perf_counter() - start
+                n_frames += len(moves) + 1
+            fps["full" if full else "incremental"] = n_frames / elapsed
+
+        results.append({"shape": (rows, cols, connect), **fps})
+        print(f"{rows}x{cols} connect {connect} | full: {fps['full']:8.0f} fps | incremental: {fps['incremental']:8.0f} fps")
+
+    return results
@@ -1,7 +1,7 @@
 import os
 import shutil
 import time
-import random
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 from search.minimax import Minimax
@@ -9,16 +9,46 @@ from search.mcts import MCTS_UCT
 from c4.state import C4State
 from search.node import *
 from search.util import BudgetExceededError
+from search.cache import EvalCache, shared_eval_cache
+from sim.store import ExperimentStore
+from sim.scheduler import CostModel, run_scheduled
+from sim.schema import MOVES_SCHEMA, write_moves, compact_moves
+from sim.records import GameLog
+from sim.latency import LatencyReport
+from sim.memory import MEMORY_COLUMNS, MemoryProbe, is_sampled
 from itertools import product
 
-def get_tree_metrics(in_place: dict, node: Node):
+def get_tree_metrics(in_place: dict, node: Node, seen: set=None):
+    """
+    Counts nodes (and pruned nodes) reachable from node.
+    Nodes shared between transpositions (MCTS_TT) are only counted once.
+    """
+    if seen is None:
+        seen = set()
+    if id(node) in seen:
+        return in_place
+    seen.add(id(node))
+
     if isinstance(node, NodeMinimax):
         in_place["n_pruned"] += 1 if node.pruned else 0
     in_place["n_nodes"] += 1
     for child in node.children:
-        get_tree_metrics(in_place, child)
+        get_tree_metrics(in_place, child, seen)
+    return in_place
+
+def get_agent_metrics(in_place: dict, agent):
+    """
+    Search statistics tracked by the agent itself rather than stored in its tree.
+    """
+    in_place["n_transpositions"] = getattr(agent, "n_transpositions", 0)
+    in_place["n_iterations"] = agent.iterations[-1] if getattr(agent, "iterations", []) else 0
+    in_place["n_peak_nodes"] = getattr(agent, "peak_nodes", in_place["n_nodes"])
+    in_place["n_reclaimed"] = getattr(agent, "n_reclaimed", 0)
+    in_place["n_ponder"] = agent.ponder_work[-1] if getattr(agent, "ponder_work", []) else 0
     return in_place
 
+COLUMNS = MOVES_SCHEMA.names
+
 def run_simulation(id: int,
                    mm_depth: int,
                    budget: int,
@@ -26,22 +56,32 @@ def run_simulation(id: int,
                    mcts_strat: str,
                    state: C4State,
                    base_seed: int,
-                   file_name: str="bin/simulations.parquet"
+                   file_name: str="bin/simulations.parquet",
+                   mcts_cls: type=MCTS_UCT,
+                   eval_cache: EvalCache=None,
+                   seed: int=None,
+                   ponder: bool=False,
+                   memory: MemoryProbe=None
                    ):
+    """
+    Plays one Minimax vs. MCTS game and records one row per move.
+    Rows are appended to the moves dataset at file_name (skipped if None, see sim/schema.py)
+    and returned as a DataFrame.
+    The MCTS agent is seeded with seed, or base_seed + id if not given.
+    With ponder, agents search during the opponent's turn; that work is recorded in n_ponder.
+    With memory, the memory use of every move is recorded too (see sim/memory.py), null otherwise.
+    """
+    rows = []
     
-    if os.path.exists(file_name):
-        df = pd.read_parquet(file_name)
-    else:
-        df = pd.DataFrame(columns=["sim_id", "move_id", "ms", "agent_curr", "agent_start", "mcts_strategy", "n_nodes",
-                                   "n_pruned", "is_win", "depth", "budget_total", "budget_consumed", "budget_left", "budget_exceeded", "connect", "bf"])
-    
-    # to ensure reproducibility of results
-    random.seed(base_seed + id)
+    # to ensure reproducibility of results (the generator belongs to the mcts agent only)
+    rng = np.random.default_rng(base_seed + id if seed is None else seed)
 
-    p1 = Minimax(budget=budget, depth=mm_depth, max_player=1) if is_mm_p1 else \
-          MCTS_UCT(budget=budget, strategy=mcts_strat, spaces=state.rows*state.cols)
-    p2 = MCTS_UCT(budget=budget, strategy=mcts_strat, spaces=state.rows*state.cols) if is_mm_p1 else \
-          Minimax(budget=budget, depth=mm_depth, max_player=1)
+    mm_kwargs = {"eval_cache": eval_cache, "ponder": ponder}
+    mcts_kwargs = {"rng": rng, "ponder": ponder}
+    p1 = Minimax(budget=budget, depth=mm_depth, max_player=1, **mm_kwargs) if is_mm_p1 else \
+          mcts_cls(budget=budget, strategy=mcts_strat, spaces=state.rows*state.cols, **mcts_kwargs)
+    p2 = mcts_cls(budget=budget, strategy=mcts_strat, spaces=state.rows*state.cols, **mcts_kwargs) if is_mm_p1 else \
+          Minimax(budget=budget, depth=mm_depth, max_player=1, **mm_kwargs)
     
     start_agent = "minimax" if is_mm_p1 else "mcts"
     is_win = False
@@ -50,6 +90,9 @@ def run_simulation(id: int,
     prev_budget_p1 = p1.budget
     prev_budget_p2 = p2.budget
 
+    if memory is not None:
+        memory.start_game()
+
     # keep playing until winner
     while state.winner == 0 and state.get_possible_moves():
         if state.last_player == 2:
@@ -62,6 +105,8 @@ def run_simulation(id: int,
             prev_budget = prev_budget_p2
 
         budget_exceeded = False
+        if memory is not None:
+            memory.before_move()
         try:
             start_time = time.time()
             move = curr_agent.pick_move(state)
@@ -70,6 +115,8 @@ def run_simulation(id: int,
             end_time = time.time()
             budget_exceeded = True
             move = None
+        if memory is not None:
+            memory.end_move()
 
         if not budget_exceeded:
             if state.last_player == 2:
@@ -82,40 +129,54 @@ def run_simulation(id: int,
 
             # explore search tree for metrics
             in_place = get_tree_metrics({"n_nodes": 0, "n_pruned": 0}, curr_agent.rootnode)
+            in_place = get_agent_metrics(in_place, curr_agent)
+            n_created = getattr(curr_agent, "n_created", None)
+            n_created = n_created if n_created is not None else in_place["n_nodes"]
         else:
             # default values when budget is exceeded
             budget_consumed = prev_budget
             budget_left = 0
-            in_place = {"n_nodes": 0, "n_pruned": 0}
+            in_place = {"n_nodes": 0, "n_pruned": 0, "n_transpositions": 0, "n_iterations": 0,
+                        "n_peak_nodes": 0, "n_reclaimed": 0, "n_ponder": 0}
+            n_created = 0
+
+        if memory is not None:
+            in_place.update(memory.metrics(n_created))
+        else:
+            in_place.update(dict.fromkeys(MEMORY_COLUMNS))
 
         if not budget_exceeded:
             state.make_move(move)   
             is_win = state.winner != 0
+            if not is_win and state.get_possible_moves():   # nothing to ponder once the game is over
+                curr_agent.ponder(state)
 
         # record data for current move
-        new_data = pd.DataFrame({
-            "sim_id": [id],
-            "move_id": [move_count],
-            "ms": [(end_time - start_time) * 1000],  # s to ms
-            "agent_curr": [curr_agent_name],
-            "agent_start": [start_agent],
-            "mcts_strategy": [mcts_strat],
-            "n_nodes": [in_place["n_nodes"]],
-            "n_pruned": [in_place["n_pruned"]],
-            "is_win": [is_win if not budget_exceeded else False],
-            "depth": [mm_depth],
-            "budget_total": [budget],
-            "budget_consumed": [budget_consumed],
-            "budget_left": [budget_left],
-            "budget_exceeded": [budget_exceeded],
+        rows.append({
+            "sim_id": id,
+            "move_id": move_count,
+            "move": move if not budget_exceeded else -1,
+            "ms": (end_time - start_time) * 1000 if memory is None else None,  # s to ms, null when slowed by tracing
+            "agent_curr": curr_agent_name,
+            "agent_start": start_agent,
+            "mcts_strategy": mcts_strat,
+            "n_nodes": in_place["n_nodes"],
+            "n_pruned": in_place["n_pruned"],
+            "n_transpositions": in_place["n_transpositions"],
+            "n_iterations": in_place["n_iterations"],
+            "n_peak_nodes": in_place["n_peak_nodes"],
+            "n_reclaimed": in_place["n_reclaimed"],
+            "n_ponder": in_place["n_ponder"],
+            **{column: in_place[column] for column in MEMORY_COLUMNS},
+            "is_win": is_win if not budget_exceeded else False,
+            "depth": mm_depth,
+            "budget_total": budget,
+            "budget_consumed": budget_consumed,
+            "budget_left": budget_left,
+            "budget_exceeded": budget_exceeded,
             "connect": state.connect,
             "bf": state.cols
         })
-
-        if len(df) != 0:
-            df = pd.concat([df, new_data], ignore_index=True)
-        else:
-            df = new_data
             
         move_count += 1
 
@@ -123,12 +184,130 @@ def run_simulation(id: int,
         if budget_exceeded:
             break
 
-    df.to_parquet(file_name, index=False)
+    for agent in (p1, p2):
+        agent.stop_pondering()
+        agent.close()
+    if memory is not None:
+        memory.end_game()
 
-def run_all_simulations(repeats: int, base_seed: int=42):
+    new_data = pd.DataFrame(rows, columns=COLUMNS)
 
-    # creating output directory
-    if os.path.exists("bin"):
+    if file_name is not None:
+        write_moves(new_data, file_name)
+
+    return new_data
+
+def play_config(config: dict, sim_id: int, base_seed: int, file_name: str=None, eval_cache: EvalCache=None,
+                memory: bool=False):
+    """
+    Plays the game described by a configuration (see run_configs), measuring its memory use if memory is set.
+    """
+    state = C4State(rows=config["rows"], cols=config["cols"], connect=config["connect"])
+    return run_simulation(
+        id=sim_id, 
+        mm_depth=config["mm_depth"], 
+        budget=config["budget"], 
+        base_seed=base_seed,
+        is_mm_p1=config["is_mm_p1"], 
+        mcts_strat=config["mcts_strat"], 
+        state=state,
+        file_name=file_name,
+        eval_cache=eval_cache,
+        seed=config.get("seed"),
+        memory=MemoryProbe() if memory else None
+    )
+
+def _play_config_worker(config: dict, sim_id: int, base_seed: int, cache: tuple, memory: bool):
+    # worker processes keep their own process-wide evaluation cache (max entries, snapshot path), read-only on disk
+    eval_cache = shared_eval_cache(*cache) if cache is not None else None
+    return play_config(config, sim_id, base_seed, eval_cache=eval_cache, memory=memory)
+
+def run_configs(configs: list, 
+                file_name: str, 
+                base_seed: int, 
+                store: ExperimentStore=None, 
+                eval_cache: EvalCache=None,
+                workers: int=1,
+                history: list=None,
+                log: GameLog=None,
+                latency: LatencyReport=None,
+                memory_every: int=0
+                ):
+    """
+    Plays one game per configuration.
+
+    Without a store, games get consecutive sim ids, are seeded with base_seed + sim id and 
+    appended to file_name.
+    With a store, games whose configuration (seeded with base_seed + repeat) was already played
+    by the current code are skipped, new ones are saved to the store, and file_name is rebuilt
+    from the store with every game of the grid.
+
+    With several workers, games are dispatched longest expected first by a cost model
+    fitted on the per-move outputs listed in history and refined as games finish.
+
+    Games played are also appended to log (configuration, seed and moves), and their 
+    move times added to the latency sketches, if given.
+    With memory_every, the memory use of one game in memory_every (by sim id) is measured.
+    """
+    if store is not None:
+        for config in configs:
+            config["seed"] = base_seed + config["repeat"]
+        pending = [config for config in configs if not store.contains(config)]
+        print(f"{len(configs) - len(pending)} simulations found in the store, {len(pending)} left to run...")
+    else:
+        pending = configs
+
+    sim_ids = [sim_count if store is None else store.sim_id(config) for sim_count, config in enumerate(pending)]
+
+    with tqdm(total=len(pending), desc="Running simulations") as pbar:
+        if workers > 1:
+            cache = None if eval_cache is None else (eval_cache.max_entries, eval_cache.path)
+            tasks = [(config, sim_id, base_seed, cache,
+                      is_sampled(sim_id, memory_every))
+                     for config, sim_id in zip(pending, sim_ids)]
+            model = CostModel.from_parquet(history or [])
+            games = []
+            for i, game in run_scheduled(_play_config_worker, tasks, pending, workers, model):
+                if log is not None:
+                    log.add(pending[i], sim_ids[i], pending[i].get("seed", base_seed + sim_ids[i]), game)
+                if latency is not None:
+                    latency.observe(game)
+                if store is not None:
+                    store.add(pending[i], game)
+                else:
+                    games.append(game)
+                pbar.update(1)
+
+            if store is None and games:
+                games = pd.concat(games, ignore_index=True).sort_values(["sim_id", "move_id"], ignore_index=True)
+                write_moves(games, file_name)
+        else:
+            for config, sim_id in zip(pending, sim_ids):
+                game = play_config(config, sim_id, base_seed, file_name if store is None else None, eval_cache,
+                                   is_sampled(sim_id, memory_every))
+                if log is not None:
+                    log.add(config, sim_id, config.get("seed", base_seed + sim_id), game)
+                if latency is not None:
+                    latency.observe(game)
+                if store is not None:
+                    store.add(config, game)
+                pbar.update(1)
+            if store is None:
+                compact_moves(file_name)
+
+    if log is not None:
+        log.flush()
+
+    if store is not None:
+        store.flush()
+        store.export(configs, file_name)
+
+def run_all_simulations(repeats: int, base_seed: int=42, eval_cache: EvalCache=None, store: ExperimentStore=None,
+                        workers: int=1, log: GameLog=None, latency: LatencyReport=None,
+                        memory_every: int=0):
+
+    # creating output directory (results kept in a store are reused instead)
+    if os.path.exists("bin") and store is None:
         shutil.rmtree("bin")  
     os.makedirs("bin", exist_ok=True)  
 
@@ -140,24 +319,17 @@ def run_all_simulations(repeats: int, base_seed: int=42):
     total_simulations = len(budgets) * len(strats) * len(depths) * len(is_mm_p1_options) * repeats
     print(f"Preparing to run {total_simulations} simulations...")
 
-    sim_count = 0
-    with tqdm(total=total_simulations, desc="Running simulations") as pbar:
-        for budget, strat, depth, is_mm_p1, _ in product(budgets, strats, depths, is_mm_p1_options, range(repeats)):
-            state = C4State(rows=6, cols=7, connect=4)
-            run_simulation(
-                id=sim_count, 
-                mm_depth=depth, 
-                budget=budget, 
-                base_seed=base_seed,
-                is_mm_p1=is_mm_p1, 
-                mcts_strat=strat, 
-                state=state,
-                file_name="bin/simulations_1.parquet"
-            )
-            sim_count += 1
-            pbar.update(1)
-
-def run_all_simulations_(repeats: int, budgets: dict, base_seed: int=42):
+    configs = [{"budget": budget, "mcts_strat": strat, "mm_depth": depth, "is_mm_p1": is_mm_p1,
+                "rows": 6, "cols": 7, "connect": 4, "repeat": repeat}
+               for budget, strat, depth, is_mm_p1, repeat in product(budgets, strats, depths, is_mm_p1_options, range(repeats))]
+
+    run_configs(configs, "bin/simulations_1.parquet", base_seed, store, eval_cache, workers,
+                history=["bin/simulations_1.parquet", "bin/simulations_2.parquet"], log=log, latency=latency,
+                memory_every=memory_every)
+
+def run_all_simulations_(repeats: int, budgets: dict, base_seed: int=42, eval_cache: EvalCache=None, store: ExperimentStore=None,
+                         workers: int=1, log: GameLog=None, latency: LatencyReport=None,
+                        memory_every: int=0):
 
     # creating output directory
     os.makedirs("bin", exist_ok=True)  
@@ -169,19 +341,10 @@ def run_all_simulations_(repeats: int, budgets: dict, base_seed: int=42):
     total_simulations = len(budgets) * len(is_mm_p1_options) * len(strats) * len(dims) * repeats
     print(f"Preparing to run {total_simulations} simulations...")
 
-    sim_count = 0
-    with tqdm(total=total_simulations, desc="Running simulations") as pbar:
-        for budget, strat, dim, is_mm_p1, _ in product(budgets.keys(), strats, dims, is_mm_p1_options, range(repeats)):
-            state = C4State(rows=dim[0], cols=dim[1], connect=dim[2])
-            run_simulation(
-                id=sim_count, 
-                mm_depth=budgets[budget], 
-                budget=budget, 
-                base_seed=base_seed,
-                is_mm_p1=is_mm_p1, 
-                mcts_strat=strat, 
-                state=state,
-                file_name="bin/simulations_2.parquet"
-            )
-            sim_count += 1
-            pbar.update(1)
\ No newline at end of file
+    configs = [{"budget": budget, "mcts_strat": strat, "mm_depth": budgets[budget], "is_mm_p1": is_mm_p1,
+                "rows": dim[0], "cols": dim[1], "connect": dim[2], "repeat": repeat}
+               for budget, strat, dim, is_mm_p1, repeat in product(budgets.keys(), strats, dims, is_mm_p1_options, range(repeats))]
+
+    run_configs(configs, "bin/simulations_2.parquet", base_seed, store, eval_cache, workers,
+                history=["bin/simulations_1.parquet", "bin/simulations_2.parquet"], log=log, latency=latency,
+                memory_every=memory_every)
@@ -0,0 +1,198 @@
+import os
+import time
+import shutil
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from c4.state import C4State
+from search.minimax import Minimax
+from search.mcts import MCTS_UCT
+
+# arrays of a shard, each saved as <name>.npy (open with np.load(..., mmap_mode="r"))
+SHARD_ARRAYS = ["boards", "to_move", "label", "best_move", "hash"]
+
+# file of a shape directory holding the seed index of the next shard (dropped shards included)
+NEXT_SHARD = "next_shard"
+
+def label_minimax(state: C4State, depth: int=4):
+    """
+    Minimax value of a position for the side to move (evaluation_function units, +-inf for forced results)
+    and the move chosen, searched to depth without a budget limit.
+    """
+    agent = Minimax(budget=10**9, depth=depth, max_player=3 - state.last_player)
+    move = agent.pick_move(state)
+    return agent.rootnode.util, move
+
+def label_mcts(state: C4State, iterations: int=1000, rng: np.random.Generator=None):
+    """
+    MCTS value of a position for the side to move (win rate of the most visited move, draws count as losses)
+    and that move, after the given number of iterations.
+    """
+    child = _mcts_search(state, iterations, rng)
+    return child.wins / child.visits, child.move
+
+def _mcts_search(state: C4State, iterations: int, rng: np.random.Generator):
+    # fixed number of iterations from state (no budget allocation), most visited root child
+    agent = MCTS_UCT(budget=iterations, strategy="thrifty", spaces=state.rows * state.cols, rng=rng)
+    agent.rootnode = agent.make_root(state)
+    for _ in range(iterations):
+        agent.iteration(state)
+    return agent.rootnode.most_visited()["node"]
+
+def sample_position(shape: tuple, rng: np.random.Generator, sampler: str="random", min_plies: int=0,
+                    max_plies: int=None, sample_iters: int=50):
+    """
+    Plays a random number of plies from the empty board, with uniform random moves ('random')
+    or a small MCTS search per move ('mcts'). Returns None if the game ended before (nothing to label).
+    """
+    rows, cols, connect = shape
+    state = C4State(rows=rows, cols=cols, connect=connect)
+    max_plies = max_plies if max_plies is not None else rows * cols - 1
+    for _ in range(int(rng.integers(min_plies, max_plies + 1))):
+        if sampler == "mcts":
+            move = _mcts_search(state, sample_iters, rng).move
+        else:
+            move = int(rng.choice(state.get_possible_moves()))
+        state.make_move(move)
+        if state.winner != 0 or not state.get_possible_moves():
+            return None
+    return state
+
+def generate_shard(shape: tuple, index: int, size: int, seed: int=42, sampler: str="random", label: str="minimax",
+                   depth: int=4, iterations: int=1000):
+    """
+    size labelled positions of a board shape, distinct within the shard.
+    Shards are seeded from (seed, shape, index), so a shard is the same whenever it is generated.
+
+    Returns:
+    (dict): SHARD_ARRAYS name to array.
+    """
+    rows, cols, connect = shape
+    rng = np.random.default_rng([seed, rows, cols, connect, index])
+    seen = set()
+    boards = np.zeros((size, rows, cols), dtype=np.int8)
+    to_move = np.zeros(size, dtype=np.int8)
+    labels = np.zeros(size, dtype=np.float32)
+    best_move = np.zeros(size, dtype=np.int8)
+    hashes = np.zeros(size, dtype=np.uint64)
+
+    n = 0
+    while n < size:
+        state = sample_position(shape, rng, sampler)
+        if state is None or state.hash in seen:
+            continue
+        seen.add(state.hash)
+
+        value, move = label_minimax(state, depth) if label == "minimax" else label_mcts(state, iterations, rng)
+        boards[n] = state.board
+        to_move[n] = 3 - state.last_player
+        labels[n] = value
+        best_move[n] = move
+        hashes[n] = state.hash
+        n += 1
+
+    return {"boards": boards, "to_move": to_move, "label": labels, "best_move": best_move, "hash": hashes}
+
+def shape_dir(root: str, shape: tuple):
+    return os.path.join(root, "{}x{}c{}".format(*shape))
+
+def load_shards(root: str, shape: tuple, mmap_mode: str="r"):
+    """
+    Shards of a board shape under root, as lists of memory-mapped arrays (SHARD_ARRAYS names).
+    """
+    path = shape_dir(root, shape)
+    shards = sorted(d for d in os.listdir(path) if d.startswith("shard_") and not d.endswith(".tmp")) \
+             if os.path.isdir(path) else []
+    return {name: [np.load(os.path.join(path, shard, f"{name}.npy"), mmap_mode=mmap_mode) for shard in shards]
+            for name in SHARD_ARRAYS}
+
+def _write_shard(path: str, arrays: dict):
+    # written aside and renamed, so an interrupted run never leaves a partial shard
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name in SHARD_ARRAYS:
+        np.save(os.path.join(tmp_path, f"{name}.npy"), arrays[name])
+    os.rename(tmp_path, path)
+
+def _read_next_index(path: str):
+    # seed index of the next shard: the persisted counter, or after the last shard written by older runs
+    try:
+        with open(os.path.join(path, NEXT_SHARD)) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        shards = [d for d in os.listdir(path) if d.startswith("shard_") and not d.endswith(".tmp")]
+        return max([int(d[len("shard_"):]) for d in shards], default=-1) + 1
+
+def _write_next_index(path: str, index: int):
+    tmp_path = os.path.join(path, NEXT_SHARD + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(str(index))
+    os.replace(tmp_path, os.path.join(path, NEXT_SHARD))
+
+def _generate_shard_task(args):
+    return generate_shard(*args)
+
+def generate_dataset(root: str,
+                     shapes: list,
+                     n_positions: int,
+                     shard_size: int=1000,
+                     sampler: str="random",
+                     label: str="minimax",
+                     depth: int=4,
+                     iterations: int=1000,
+                     workers: int=1,
+                     seed: int=42
+                     ):
+    """
+    Labelled positions of every board shape, written under root as <rows>x<cols>c<connect>/shard_<i>/<array>.npy
+    (see SHARD_ARRAYS): boards (n, rows, cols) int8, side to move, label (float32), best move and zobrist hash.
+
+    Shards are generated in parallel by workers processes. Positions already stored for a shape
+    (same hash) are dropped before a shard is written, so shards may hold fewer than shard_size positions.
+    Existing shards are kept: an interrupted run resumes where it stopped, until n_positions per shape are stored.
+    Shards are seeded by index, and the next index is kept in NEXT_SHARD, so a shard whose positions
+    were all dropped is not generated again by a later run.
+
+    Returns:
+    (dict): Positions written, seconds and positions per second.
+    """
+    written = 0
+    start = time.perf_counter()
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for shape in shapes:
+            path = shape_dir(root, shape)
+            os.makedirs(path, exist_ok=True)
+            stored = load_shards(root, shape)
+            seen = set(np.concatenate(stored["hash"]).tolist()) if stored["hash"] else set()
+            index = _read_next_index(path)
+
+            while len(seen) < n_positions:
+                # one batch of shards per round, enough to fill the shape if nothing is dropped
+                n_shards = -(-(n_positions - len(seen)) // shard_size)
+                tasks = [(shape, i, shard_size, seed, sampler, label, depth, iterations)
+                         for i in range(index, index + n_shards)]
+                shards = pool.map(_generate_shard_task, tasks) if pool is not None else map(_generate_shard_task, tasks)
+
+                before = len(seen)
+                for arrays in shards:
+                    keep = np.array([h not in seen for h in arrays["hash"].tolist()], dtype=bool)
+                    keep &= np.cumsum(keep) <= n_positions - len(seen)
+                    if keep.any():
+                        _write_shard(os.path.join(path, f"shard_{index:05d}"), {name: arrays[name][keep] for name in SHARD_ARRAYS})
+                        seen.update(arrays["hash"][keep].tolist())
+                        written += int(keep.sum())
+                    index += 1
+                    _write_next_index(path, index)
+                if len(seen) == before:
+                    print(f"No new positions for {shape}, stopping at {len(seen)}")
+                    break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    seconds = time.perf_counter() - start
+    stats = {"positions": written, "seconds": seconds, "positions_per_sec": written / seconds if seconds else 0.0}
+    print(f"{written} positions in {seconds:.1f} s ({stats['positions_per_sec']:.1f} positions/s)")
+    return stats
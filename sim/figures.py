@@ -5,50 +5,36 @@ import seaborn as sns
 from c4.state import C4State
 import matplotlib.pyplot as plt
 from search.node import NodeMCTS, NodeMinimax
+import pyarrow.dataset as ds
+from sim.aggregate import load_summaries, rollup
+from sim.schema import read_moves
 
 def fig_1(path_to_table: str, out_path: str):
 
-    # first curate the data
+    # first curate the data (from the config summaries of the simulations)
 
-    sims = pd.read_parquet(path_to_table)
-
-    sims['adjusted_win'] = ((sims['agent_curr'] == 'minimax') & sims['is_win']) | (
-        (sims['agent_curr'] == 'mcts') & sims['budget_exceeded']
-    )
-
-    outcomes_ = sims.groupby('sim_id')['adjusted_win'].any().reset_index()
-    metadata = sims[['sim_id', 'depth', 'budget_total', 'mcts_strategy']].drop_duplicates()
-    outcomes = pd.merge(outcomes_, metadata, on='sim_id')
+    _, configs = load_summaries(path_to_table)
 
     # line plots
-    line_grouped = outcomes.groupby(['depth', 'budget_total'])['adjusted_win'].mean().reset_index()
-    line_pivoted = line_grouped.pivot(index='depth', columns='budget_total', values='adjusted_win')
+    line_grouped = rollup(configs, ['depth', 'budget_total'])
+    line_pivoted = line_grouped.pivot(index='depth', columns='budget_total', values='win_rate')
 
     # heatmaps
-    heatmap_grouped = outcomes.groupby(['depth', 'budget_total', 'mcts_strategy'])['adjusted_win'].mean().reset_index()
+    heatmap_grouped = rollup(configs, ['depth', 'budget_total', 'mcts_strategy'])
     strategies = heatmap_grouped['mcts_strategy'].unique()
 
     # minimax losses
-    minimax_losses = sims[(sims['agent_curr'] == 'minimax') & (sims['budget_exceeded'])]
-    minimax_loss_counts = minimax_losses.groupby(['depth', 'budget_total']).size().reset_index(name='losses')
+    minimax_loss_counts = rollup(configs, ['depth', 'budget_total'])[['depth', 'budget_total', 'forfeits_minimax']]
+    minimax_loss_counts = minimax_loss_counts.rename(columns={'forfeits_minimax': 'losses'})
 
     # mcts losses
-    mcts_losses = sims[(sims['agent_curr'] == 'mcts') & (sims['budget_exceeded'])]
-    mcts_loss_counts = mcts_losses.groupby(['mcts_strategy', 'budget_total']).size().reset_index(name='losses')
+    mcts_loss_counts = rollup(configs, ['mcts_strategy', 'budget_total'])[['mcts_strategy', 'budget_total', 'forfeits_mcts']]
+    mcts_loss_counts = mcts_loss_counts.rename(columns={'forfeits_mcts': 'losses'})
 
     budgets = minimax_loss_counts['budget_total'].unique()
     depths = minimax_loss_counts['depth'].unique()
     strats = mcts_loss_counts['mcts_strategy'].unique()
 
-    full_combinations_mm = pd.DataFrame([(depth, budget) for depth in depths for budget in budgets], columns=['depth', 'budget_total'])
-    full_combinations_mcts = pd.DataFrame([(strat, budget) for strat in strats for budget in budgets], columns=['mcts_strategy', 'budget_total'])
-
-    minimax_loss_counts = pd.merge(full_combinations_mm, minimax_loss_counts, how='left', on=['depth', 'budget_total'])
-    mcts_loss_counts = pd.merge(full_combinations_mcts, mcts_loss_counts, how='left', on=['mcts_strategy', 'budget_total'])
-
-    minimax_loss_counts['losses'].fillna(0, inplace=True)
-    mcts_loss_counts['losses'].fillna(0, inplace=True)
-
     # now plot the data
 
     fig, axes = plt.subplots(2, 3, figsize=(16, 9))  # 2 rows, 3 columns 
@@ -94,13 +80,13 @@ def fig_1(path_to_table: str, out_path: str):
     ax_top_right.grid(True, axis='y', alpha=0.5)
 
     # heat maps (bottom row)
-    vmin, vmax = heatmap_grouped['adjusted_win'].min(), heatmap_grouped['adjusted_win'].max()
+    vmin, vmax = heatmap_grouped['win_rate'].min(), heatmap_grouped['win_rate'].max()
     cbar_ax = fig.add_axes([0.92, 0.12, 0.02, 0.25])  
 
     for i, strategy in enumerate(strategies):
         ax_bottom = axes[1, i]  
         strategy_data = heatmap_grouped[heatmap_grouped['mcts_strategy'] == strategy]
-        pivoted = strategy_data.pivot(index='depth', columns='budget_total', values='adjusted_win')
+        pivoted = strategy_data.pivot(index='depth', columns='budget_total', values='win_rate')
 
         sns.heatmap(pivoted, ax=ax_bottom, annot=True, fmt=".2f", cmap="viridis", cbar=i == 0,
                     cbar_ax=cbar_ax if i == 0 else None, vmin=vmin, vmax=vmax, linewidths=0.5)
@@ -122,7 +108,9 @@ def fig_1(path_to_table: str, out_path: str):
 
 
 def fig_2(path_to_table: str, best_depths: dict, out_path: str):
-    sims = pd.read_parquet(path_to_table)
+    # per-move data, only the columns plotted and the budgets shown
+    sims = read_moves(path_to_table, columns=['agent_curr', 'ms', 'n_nodes', 'move_id', 'depth', 'budget_total'],
+                      filter=ds.field('budget_total').isin(list(best_depths.keys())))
 
     # estimating bytes per tree node
     state = C4State()
@@ -133,7 +121,8 @@ def fig_2(path_to_table: str, best_depths: dict, out_path: str):
     sims['bytes'] = sims['n_nodes'] * bytes_per_node
 
     # filter for sims where depth and budget align with the best depths
-    filtered_sims = sims[sims.apply(lambda row: row['depth'] == best_depths.get(row['budget_total']), axis=1)]
+    filtered_sims = sims[sims['depth'] == sims['budget_total'].map(best_depths)].copy()
+    filtered_sims['agent_curr'] = filtered_sims['agent_curr'].astype(str)
     
     # Map agents to numeric values (case should be consistent here)
     filtered_sims['agent_numeric'] = filtered_sims['agent_curr'].map({'minimax': 0, 'mcts': 1})
@@ -144,6 +133,7 @@ def fig_2(path_to_table: str, best_depths: dict, out_path: str):
     for i, budget in enumerate(best_depths.keys()):
         ax = axes[0, i] 
         budget_sims = filtered_sims[filtered_sims['budget_total'] == budget]
+        budget_sims = budget_sims[budget_sims['ms'].notna()]    # games whose memory was measured have no move times
 
         sns.boxplot(x='agent_curr', y='ms', data=budget_sims, ax=ax, showfliers=False, width=0.3,
                     boxprops=dict(facecolor='none'), whiskerprops=dict(color='black'),
@@ -191,25 +181,28 @@ def fig_2(path_to_table: str, best_depths: dict, out_path: str):
     plt.savefig(out_path, dpi=300, bbox_inches='tight')
 
 def fig_3(path_to_table: str, best_depths: dict, out_path: str):
-    sims = pd.read_parquet(path_to_table)
+    _, configs = load_summaries(path_to_table)
 
     # filter for sims where depth and budget align with the best depths
-    filtered_sims = sims[sims.apply(lambda row: row['depth'] == best_depths.get(row['budget_total']), axis=1)]
+    filtered_configs = configs[configs['depth'] == configs['budget_total'].map(best_depths)]
 
-    # include only moves that resulted in a win
-    winning_moves = filtered_sims[filtered_sims['is_win']]
-    mean_moves_to_win = winning_moves.groupby(['agent_curr', 'mcts_strategy', 'budget_total'])['move_id'].mean().reset_index()
+    # include only games that ended in a win
+    wins = rollup(filtered_configs, ['mcts_strategy', 'budget_total'])
+    mean_moves_to_win = pd.concat([
+        wins[['mcts_strategy', 'budget_total']].assign(agent_curr=agent, move_id=wins[f'mean_moves_to_win_{agent}'])
+        for agent in ['mcts', 'minimax']]).dropna(subset=['move_id']).reset_index(drop=True)
 
     # starting agent == winning agent?
-    winning_moves['is_starting_agent_winner'] = (winning_moves['agent_curr'] == winning_moves['agent_start'])
-    winning_moves['outcome'] = winning_moves['is_starting_agent_winner'].map({True: 'win', False: 'loss'})
+    outcomes = rollup(filtered_configs, ['budget_total', 'agent_start'])
+    outcomes['win'] = np.where(outcomes['agent_start'] == 'minimax', outcomes['wins_minimax'], outcomes['wins_mcts'])
+    outcomes['loss'] = np.where(outcomes['agent_start'] == 'minimax', outcomes['wins_mcts'], outcomes['wins_minimax'])
 
     fig, axes = plt.subplots(2, 4, figsize=(14, 7), constrained_layout=True)
 
     # heatmaps (top-row)
     for idx, budget in enumerate(best_depths.keys()):
-        budget_moves = winning_moves[winning_moves['budget_total'] == budget]
-        contingency_table = pd.crosstab(budget_moves['agent_start'], budget_moves['outcome'])
+        contingency_table = outcomes[outcomes['budget_total'] == budget].set_index('agent_start')[['loss', 'win']]
+        contingency_table = contingency_table.rename_axis(index='agent_start', columns='outcome').astype(int)
         sns.heatmap(contingency_table, annot=True, cmap="viridis", fmt="d", cbar=False, ax=axes[0, idx])
         axes[0, idx].set_title(f'Budget: {budget}', fontsize=14)
         axes[0, idx].set_ylabel("Starting Agent", fontsize=12)
@@ -229,58 +222,30 @@ def fig_3(path_to_table: str, best_depths: dict, out_path: str):
 
 def fig_4(path_to_table_1: str, path_to_table_2: str, best_depths: dict, out_path: str):
 
-    sims_x = pd.read_parquet(path_to_table_2)   # sims of connect 3, 5 and 6
-    sims_4 = pd.read_parquet(path_to_table_1)   # sims of connect 4
+    _, configs_x = load_summaries(path_to_table_2)   # sims of connect 3, 5 and 6
+    _, configs_4 = load_summaries(path_to_table_1)   # sims of connect 4
 
     # prepare the data
 
-    sims_4["connect"] = 4   # attributes not included in first round of simulations
-    sims_4["bf"] = 7        # should be ok now
-
-    sims_x['adjusted_win'] = (
-        ((sims_x['agent_curr'] == 'minimax') & sims_x['is_win']) |
-        ((sims_x['agent_curr'] == 'mcts') & sims_x['budget_exceeded'])
-    )
-
-    sims_4['adjusted_win'] = (
-        ((sims_4['agent_curr'] == 'minimax') & sims_4['is_win']) |
-        ((sims_4['agent_curr'] == 'mcts') & sims_4['budget_exceeded'])
-    )
-
-    sims_4_filtered = sims_4[sims_4.apply(lambda row: row['depth'] == best_depths.get(row['budget_total']), axis=1)]
-
-    winning_sims_x = sims_x[sims_x['is_win']]
-    winning_sims_3 = winning_sims_x[winning_sims_x['connect'] == 3]
-    winning_sims_6 = winning_sims_x[winning_sims_x['connect'] == 6]
-    winning_sims_7 = winning_sims_x[winning_sims_x['connect'] == 7]
-    winning_sims_4 = sims_4_filtered[sims_4_filtered['is_win']]
-
-    combined_winning_sims = pd.concat([winning_sims_3, winning_sims_4, winning_sims_6, winning_sims_7])
-
-    average_moves_by_connect_budget = (combined_winning_sims.groupby(['connect', 'agent_curr', 'budget_total'])['move_id'].mean()
-                                       .reset_index().rename(columns={'move_id': 'average_moves'}))
-
-    simulations_by_connect_budget = (combined_winning_sims.groupby(['connect', 'agent_curr', 'budget_total'])['move_id'].count()
-                                       .reset_index().rename(columns={'move_id': 'n_simulations'}))
-
-    # average and n_simulations together
-    average_moves_by_connect_budget = pd.merge(average_moves_by_connect_budget, simulations_by_connect_budget, on=['connect', 'agent_curr', 'budget_total'])
+    configs_4 = configs_4.assign(connect=4, bf=7)   # attributes not included in first round of simulations
 
-    # prepare outcomes for c4 simulations
-    outcomes_4 = sims_4_filtered.groupby('sim_id')['adjusted_win'].any().reset_index()
-    metadata_4 = sims_4_filtered[['sim_id', 'depth', 'bf', 'budget_total']].drop_duplicates()
-    outcomes_4 = pd.merge(outcomes_4, metadata_4, on='sim_id')
+    configs_4_filtered = configs_4[configs_4['depth'] == configs_4['budget_total'].map(best_depths)]
 
-    # prepapre outcomes for cx simulations
-    outcomes_x = sims_x.groupby('sim_id')['adjusted_win'].any().reset_index()
-    metadata_x = sims_x[['sim_id', 'bf', 'budget_total', 'depth']].drop_duplicates()
-    outcomes_x = pd.merge(outcomes_x, metadata_x, on='sim_id')
+    winning_configs_x = configs_x[configs_x['connect'].isin([3, 6, 7])]
+    combined_configs = pd.concat([winning_configs_x, configs_4_filtered])
 
-    combined_outcomes = pd.concat([outcomes_x, outcomes_4], ignore_index=True)
+    # average moves to win and number of wins of each agent
+    by_connect_budget = rollup(combined_configs, ['connect', 'budget_total'])
+    average_moves_by_connect_budget = pd.concat([
+        by_connect_budget[['connect', 'budget_total']].assign(agent_curr=agent,
+                                                               average_moves=by_connect_budget[f'mean_moves_to_win_{agent}'],
+                                                               n_simulations=by_connect_budget[f'wins_{agent}'])
+        for agent in ['mcts', 'minimax']])
+    average_moves_by_connect_budget = average_moves_by_connect_budget[average_moves_by_connect_budget['n_simulations'] > 0]
 
-    # calculate win rate
-    win_rate_by_bf_budget = (combined_outcomes.groupby(['bf', 'budget_total'])['adjusted_win'].mean()
-                             .reset_index().rename(columns={'adjusted_win': 'win_rate'}))
+    # calculate win rate (c4 simulations only at the best depths)
+    combined_outcomes = pd.concat([configs_x, configs_4_filtered], ignore_index=True)
+    win_rate_by_bf_budget = rollup(combined_outcomes, ['bf', 'budget_total'])[['bf', 'budget_total', 'win_rate']]
 
     fig = plt.figure(figsize=(20, 9))
     gs = fig.add_gridspec(2, 4)  # line plot will occupy top row
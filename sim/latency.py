@@ -0,0 +1,196 @@
+import json
+import numpy as np
+import pandas as pd
+
+# per-move columns grouping the latency of a configuration
+CONFIG_KEYS = ["agent_curr", "mcts_strategy", "budget_total", "depth", "bf", "connect"]
+
+QUANTILES = [0.5, 0.95, 0.99]
+
+class LatencySketch(object):
+    """
+    Streaming quantile sketch of move times (ms), with bounded relative error.
+
+    Samples fall in logarithmic buckets of ratio gamma = (1 + accuracy) / (1 - accuracy),
+    so any quantile is known within the relative accuracy, whatever the number of samples.
+    Count, sum, min and max are exact. Sketches with the same parameters can be merged.
+    """
+
+    def __init__(self, accuracy: float=0.01, min_ms: float=1e-3, max_ms: float=1e7):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.min_ms = min_ms
+        self.offset = int(np.ceil(np.log(min_ms) / np.log(self.gamma)))
+        self.counts = np.zeros(int(np.ceil(np.log(max_ms) / np.log(self.gamma))) - self.offset + 1, dtype=np.int64)
+
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def add(self, ms: np.array):
+        ms = np.maximum(np.asarray(ms, dtype=np.float64).ravel(), self.min_ms)
+        if len(ms) == 0:
+            return
+        buckets = np.ceil(np.log(ms) / np.log(self.gamma)).astype(np.int64) - self.offset
+        np.add.at(self.counts, np.clip(buckets, 0, len(self.counts) - 1), 1)
+
+        self.count += len(ms)
+        self.sum += float(ms.sum())
+        self.min = min(self.min, float(ms.min()))
+        self.max = max(self.max, float(ms.max()))
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float):
+        if self.count == 0:
+            return float('nan')
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * (self.count - 1), side="right"))
+        value = 2 * self.gamma ** (bucket + self.offset) / (self.gamma + 1)    # middle of the bucket
+        return min(max(value, self.min), self.max)
+
+    def mean(self):
+        return self.sum / self.count if self.count else float('nan')
+
+class LatencyReport(object):
+    """
+    Move-time sketches of a sweep, updated game by game without keeping the samples:
+        - per configuration (agent, strategy, budget, depth, board size)
+        - per agent and move number (time distribution along the game)
+    """
+
+    def __init__(self, accuracy: float=0.01):
+        self.accuracy = accuracy
+        self.configs = {}   # config key -> LatencySketch
+        self.moves = {}     # (agent, move id) -> LatencySketch
+
+    def sketch(self, table: dict, key: tuple):
+        if key not in table:
+            table[key] = LatencySketch(self.accuracy)
+        return table[key]
+
+    def observe(self, sims: pd.DataFrame):
+        """
+        Adds per-move rows (one or more games, in the layout of run_simulation).
+        Moves where the budget was exceeded, or without a time (memory measured, see MemoryProbe), are left out.
+        """
+        sims = sims[~sims["budget_exceeded"] & sims["ms"].notna()]
+        for key, group in sims.groupby(CONFIG_KEYS, observed=True):
+            self.sketch(self.configs, tuple(_plain(k) for k in key)).add(group["ms"].to_numpy())
+        for key, group in sims.groupby(["agent_curr", "move_id"], observed=True):
+            self.sketch(self.moves, tuple(_plain(k) for k in key)).add(group["ms"].to_numpy())
+
+    @classmethod
+    def from_moves(cls, path: str, accuracy: float=0.01):
+        """
+        Report of a stored moves dataset, streamed batch by batch.
+        """
+        from sim.schema import open_moves
+
+        report = cls(accuracy)
+        moves = open_moves(path)
+        columns = [column for column in CONFIG_KEYS + ["move_id", "ms", "budget_exceeded"]
+                   if column in moves.schema.names]
+        for batch in moves.to_batches(columns=columns):
+            report.observe(batch.to_pandas())
+        return report
+
+    def merge(self, other):
+        for table, other_table in ((self.configs, other.configs), (self.moves, other.moves)):
+            for key, sketch in other_table.items():
+                self.sketch(table, key).merge(sketch)
+        return self
+
+    def summary(self, table: dict=None, keys: list=CONFIG_KEYS):
+        """
+        Count, mean, p50, p95, p99 and max move time of every sketch of table (configurations by default).
+        """
+        table = self.configs if table is None else table
+        rows = []
+        for key, sketch in table.items():
+            row = dict(zip(keys, key))
+            row.update({"count": sketch.count, "mean": sketch.mean(), "max": sketch.max})
+            row.update({f"p{round(q * 100)}": sketch.quantile(q) for q in QUANTILES})
+            rows.append(row)
+        columns = keys + ["count", "mean"] + [f"p{round(q * 100)}" for q in QUANTILES] + ["max"]
+        return pd.DataFrame(rows, columns=columns).sort_values(keys, ignore_index=True)
+
+    def move_summary(self):
+        return self.summary(self.moves, ["agent_curr", "move_id"])
+
+    def save(self, path: str):
+        """
+        Saves the sketches (npz), so that a report can be resumed across sweeps.
+        """
+        tables = {"configs": self.configs, "moves": self.moves}
+        arrays = {}
+        for name, table in tables.items():
+            keys = list(table.keys())
+            sketches = [table[key] for key in keys]
+            arrays[f"{name}_keys"] = np.array(json.dumps(keys))
+            arrays[f"{name}_counts"] = np.array([s.counts for s in sketches]).reshape(len(keys), -1)
+            arrays[f"{name}_stats"] = np.array([(s.count, s.sum, s.min, s.max) for s in sketches]).reshape(len(keys), 4)
+        np.savez_compressed(path, accuracy=self.accuracy, **arrays)
+
+    @classmethod
+    def load(cls, path: str):
+        data = np.load(path)
+        report = cls(float(data["accuracy"]))
+        for name, table in (("configs", report.configs), ("moves", report.moves)):
+            keys = json.loads(str(data[f"{name}_keys"]))
+            for key, counts, (count, total, low, high) in zip(keys, data[f"{name}_counts"], data[f"{name}_stats"]):
+                sketch = report.sketch(table, tuple(key))
+                sketch.counts[:] = counts
+                sketch.count, sketch.sum, sketch.min, sketch.max = int(count), total, low, high
+        return report
+
+    def plot(self, out_path: str):
+        """
+        Tail latency per configuration (top) and move-time quantiles along the game (bottom).
+        """
+        import matplotlib.pyplot as plt
+
+        summary = self.summary()
+        moves = self.move_summary()
+
+        fig, axes = plt.subplots(2, 1, figsize=(16, 10))
+
+        ax = axes[0]
+        summary = summary.sort_values("p99", ascending=False, ignore_index=True)
+        labels = [f"{r.agent_curr} {r.mcts_strategy if r.agent_curr == 'mcts' else 'd' + str(r.depth)} "
+                  f"b{r.budget_total} {r.bf}c{r.connect}" for r in summary.itertuples()]
+        x = np.arange(len(summary))
+        for column, marker in [("p50", "o"), ("p95", "s"), ("p99", "^"), ("max", "x")]:
+            ax.scatter(x, summary[column], marker=marker, label=column, zorder=5)
+        ax.set_yscale("log")
+        ax.set_xticks(x)
+        ax.set_xticklabels(labels, rotation=90, fontsize=7)
+        ax.set_ylabel("Time per Move (ms)", fontsize=14)
+        ax.set_title("Move Time Percentiles per Configuration (slowest first)", fontsize=16)
+        ax.legend(fontsize=10)
+        ax.grid(alpha=0.5)
+
+        ax = axes[1]
+        for agent, data in moves.groupby("agent_curr"):
+            line, = ax.plot(data["move_id"], data["p50"], label=f"{agent} p50")
+            ax.fill_between(data["move_id"], data["p50"], data["p99"], color=line.get_color(), alpha=0.2,
+                            label=f"{agent} p50-p99")
+        ax.set_yscale("log")
+        ax.set_xlabel("Move ID", fontsize=14)
+        ax.set_ylabel("Time per Move (ms)", fontsize=14)
+        ax.set_title("Move Time along the Game", fontsize=16)
+        ax.legend(fontsize=10)
+        ax.grid(alpha=0.5)
+
+        plt.tight_layout()
+        plt.savefig(out_path, dpi=300, bbox_inches='tight')
+
+def _plain(value):
+    # numpy scalars to python values (keys are saved as json)
+    return value.item() if hasattr(value, "item") else value
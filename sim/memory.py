@@ -0,0 +1,75 @@
+import gc
+import os
+import resource
+import tracemalloc
+from c4.state import C4State
+
+# per-move columns added by a MemoryProbe (null in games that were not sampled)
+MEMORY_COLUMNS = ["mem_peak", "mem_per_node", "n_states", "rss_growth"]
+
+def rss_bytes():
+    """
+    Resident set size of the process (peak RSS where /proc is not available).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def count_states():
+    """
+    Live C4State objects (the states held by search trees, among others).
+    """
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, C4State))
+
+def is_sampled(sim_id: int, every: int):
+    """
+    Whether the memory of game sim_id is measured when sampling one game in every.
+    """
+    return every > 0 and sim_id % every == 0
+
+class MemoryProbe(object):
+    """
+    Memory use of a game, measured around every pick_move:
+        - mem_peak: peak traced allocation during the move, above what was allocated before it (bytes)
+        - mem_per_node: mem_peak per node created during the move (null if none, e.g. a reused pondered search)
+        - n_states: live C4State objects after the move
+        - rss_growth: resident set size after the move, above the one at the start of the game (bytes)
+
+    Allocations are traced (tracemalloc) for the whole game, which slows searches down;
+    games are meant to be sampled (see is_sampled), and the move times of measured games are not recorded (null).
+    """
+
+    def __init__(self):
+        self.started = False    # tracing started by this probe (stopped at the end of the game)
+        self.rss_start = 0
+        self.current = 0
+        self.peak = 0
+
+    def start_game(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        self.rss_start = rss_bytes()
+
+    def before_move(self):
+        tracemalloc.reset_peak()
+        self.current = tracemalloc.get_traced_memory()[0]
+
+    def end_move(self):
+        # read right after the search, before other allocations (e.g. tree metrics)
+        self.peak = max(tracemalloc.get_traced_memory()[1] - self.current, 0)
+
+    def metrics(self, n_created: int):
+        return {
+            "mem_peak": self.peak,
+            "mem_per_node": self.peak / n_created if n_created else float('nan'),
+            "n_states": count_states(),
+            "rss_growth": rss_bytes() - self.rss_start
+        }
+
+    def end_game(self):
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
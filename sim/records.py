@@ -0,0 +1,183 @@
+import os
+import numpy as np
+import pandas as pd
+from c4.state import C4State
+from c4.vec_state import VecC4State
+from c4.geometry import get_geometry
+
+STRATEGIES = ["greedy", "optimistic", "thrifty", "adaptive"]
+
+# fixed-size header of a game (the moves are stored apart, one byte per ply)
+GAME_DTYPE = np.dtype([
+    ("sim_id", "<i8"),
+    ("seed", "<i8"),
+    ("budget", "<i4"),
+    ("rows", "u1"),
+    ("cols", "u1"),
+    ("connect", "u1"),
+    ("mm_depth", "u1"),
+    ("is_mm_p1", "?"),
+    ("strategy", "u1"),     # index in STRATEGIES
+    ("winner", "u1"),       # 0: none, 1: p1, 2: p2
+    ("forfeit", "u1"),      # player that exceeded its budget (0: none)
+    ("offset", "<i8"),      # first ply in the moves file
+    ("n_moves", "<i2"),
+])
+
+class GameLog(object):
+    """
+    Binary log of finished games, under root:
+        - games.bin: one GAME_DTYPE header per game (configuration, seed, outcome)
+        - moves.bin: the column played at every ply (uint8), games back to back
+
+    Games are buffered and appended in bulk; both files are read through memory maps,
+    so opening a log does not load it.
+    """
+
+    def __init__(self, root: str="bin/games", flush_every: int=1000):
+        self.root = root
+        self.flush_every = flush_every  # games buffered before appending to the files
+        self.games_path = os.path.join(root, "games.bin")
+        self.moves_path = os.path.join(root, "moves.bin")
+        self.headers = []
+        self.buffer = []
+
+        os.makedirs(root, exist_ok=True)
+        self.n_plies = os.path.getsize(self.moves_path) if os.path.exists(self.moves_path) else 0
+
+    def add(self, config: dict, sim_id: int, seed: int, game: pd.DataFrame):
+        """
+        Buffers a game played by run_simulation (its per-move rows).
+        p1 plays the even move ids.
+        """
+        moves = game["move"].to_numpy()
+        moves = moves[moves >= 0].astype(np.uint8)
+        player = lambda rows: 0 if len(rows) == 0 else 1 + int(rows["move_id"].iloc[0]) % 2
+
+        header = np.zeros(1, dtype=GAME_DTYPE)
+        header[0] = (sim_id, seed, config["budget"], config["rows"], config["cols"], config["connect"],
+                     config["mm_depth"], config["is_mm_p1"], STRATEGIES.index(config["mcts_strat"]),
+                     player(game[game["is_win"]]), player(game[game["budget_exceeded"]]),
+                     self.n_plies, len(moves))
+
+        self.headers.append(header)
+        self.buffer.append(moves)
+        self.n_plies += len(moves)
+        if len(self.headers) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.headers:
+            return
+        with open(self.moves_path, "ab") as f:
+            np.concatenate(self.buffer).tofile(f)
+        with open(self.games_path, "ab") as f:
+            np.concatenate(self.headers).tofile(f)
+        self.headers = []
+        self.buffer = []
+
+    def games(self):
+        """
+        Memory-mapped headers of every stored game.
+        """
+        self.flush()
+        if not os.path.exists(self.games_path) or os.path.getsize(self.games_path) == 0:
+            return np.zeros(0, dtype=GAME_DTYPE)
+        return np.memmap(self.games_path, dtype=GAME_DTYPE, mode="r")
+
+    def moves(self):
+        """
+        Memory-mapped moves of every stored game (see the offset and n_moves of each header).
+        """
+        self.flush()
+        if self.n_plies == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(self.moves_path, dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return len(self.games())
+
+    def to_frame(self):
+        """
+        Headers as a DataFrame (strategy names decoded).
+        """
+        games = pd.DataFrame(np.asarray(self.games()))
+        games["mcts_strat"] = np.array(STRATEGIES)[games["strategy"]] if len(games) else []
+        return games.drop(columns=["strategy"])
+
+    def game_moves(self, i: int):
+        header = self.games()[i]
+        return self.moves()[header["offset"]:header["offset"] + header["n_moves"]].astype(np.int64)
+
+def trajectory(log: GameLog, i: int):
+    """
+    Every position of game i, from the empty board to the final one.
+    """
+    header = log.games()[i]
+    state = C4State(rows=int(header["rows"]), cols=int(header["cols"]), connect=int(header["connect"]))
+    states = [state.copy()]
+    for move in log.game_moves(i):
+        state.make_move(int(move))
+        states.append(state.copy())
+    return states
+
+def replay(log: GameLog, metrics: dict, index: np.array=None):
+    """
+    Replays stored games without searching: all games of a board shape are stepped
+    together in a VecC4State, one ply at a time.
+
+    Parameters:
+    log (GameLog): Stored games.
+    metrics (dict): Name to function of a VecC4State returning one value per game,
+                    evaluated on every position (from the empty board to the final one).
+    index (np.array): Games to replay (all by default).
+
+    Returns:
+    (dict): Name to (games, max plies + 1) array of metric values, NaN after the last position of a game.
+    """
+    games = log.games()
+    moves = log.moves()
+    index = np.arange(len(games)) if index is None else np.asarray(index)
+    games = np.asarray(games[index])
+
+    max_plies = int(games["n_moves"].max()) if len(games) else 0
+    results = {name: np.full((len(games), max_plies + 1), np.nan) for name in metrics}
+
+    shapes = np.unique(games[["rows", "cols", "connect"]])
+    for rows, cols, connect in shapes:
+        selected = np.nonzero((games["rows"] == rows) & (games["cols"] == cols) & (games["connect"] == connect))[0]
+        n_moves = games["n_moves"][selected].astype(np.int64)
+        plies = int(n_moves.max())
+
+        # (games, plies) moves, -1 once a game is over
+        played = np.arange(plies) < n_moves[:, None]
+        padded = np.full((len(selected), plies), -1, dtype=np.int64)
+        padded[played] = moves[(games["offset"][selected][:, None] + np.arange(plies))[played]]
+
+        vec = VecC4State(len(selected), rows=int(rows), cols=int(cols), connect=int(connect))
+        for ply in range(plies + 1):
+            active = ply <= n_moves
+            for name, metric in metrics.items():
+                results[name][selected[active], ply] = np.asarray(metric(vec))[active]
+            if ply < plies:
+                vec.step(padded[:, ply])
+
+    return results
+
+# vectorised metrics for replay
+
+def open_windows(vec: VecC4State, player: int):
+    """
+    Winning windows without opponent chips, in every game.
+    """
+    windows = get_geometry(vec.rows, vec.cols, vec.connect).windows
+    boards = vec.boards.reshape(vec.n, -1)
+    return (~(boards[:, windows] == 3 - player).any(axis=2)).sum(axis=1)
+
+def threats(vec: VecC4State, player: int):
+    """
+    Windows holding connect-1 chips of player and one empty cell, in every game.
+    """
+    windows = get_geometry(vec.rows, vec.cols, vec.connect).windows
+    cells = vec.boards.reshape(vec.n, -1)[:, windows]
+    return (((cells == player).sum(axis=2) == vec.connect - 1) & (cells == 0).any(axis=2)).sum(axis=1)
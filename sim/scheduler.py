@@ -0,0 +1,101 @@
+import os
+import time
+import numpy as np
+from sim.schema import read_moves
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+class CostModel(object):
+    """
+    Predicts the cost (ms) of a game from its configuration.
+
+    log(ms) is modelled as a linear function of log(budget), Minimax depth and log(board cells),
+    fitted by least squares on observed games. Until enough games are observed, a prior
+    proportional to budget * cells * 2^depth is used (only the ordering matters for scheduling).
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.xtx = np.zeros((4, 4))     # normal equations, updated online
+        self.xty = np.zeros(4)
+        self.coefs = np.array([np.log(1e-3), 1.0, np.log(2), 1.0])  # prior
+
+    def x(self, config: dict):
+        return [1.0, np.log(config["budget"]), config["mm_depth"], np.log(config["rows"] * config["cols"])]
+
+    def predict(self, features: np.array):
+        """
+        Expected ms of the games whose features (see x) are given as rows.
+        """
+        return np.exp(features @ self.coefs)
+
+    def observe(self, config: dict, ms: float):
+        """
+        Adds a finished game and refits the model.
+        """
+        x = np.array(self.x(config))
+        self.xtx += np.outer(x, x)
+        self.xty += x * np.log(max(ms, 1e-3))
+        self.n += 1
+        if self.n > len(x):
+            self.coefs = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+
+    @classmethod
+    def from_parquet(cls, paths: list):
+        """
+        Model fitted on the per-move outputs of previous sweeps.
+        Sweeps only record the number of columns, boards are assumed to have one row less (as in every sweep).
+        """
+        model = cls()
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            sims = read_moves(path, columns=["sim_id", "ms", "budget_total", "depth", "bf"])
+            sims = sims[~sims["sim_id"].isin(sims.loc[sims["ms"].isna(), "sim_id"])]    # games without times (memory measured)
+            games = sims.groupby("sim_id").agg(ms=("ms", "sum"), budget=("budget_total", "first"),
+                                               mm_depth=("depth", "first"), cols=("bf", "first"))
+            for game in games.itertuples():
+                model.observe({"budget": game.budget, "mm_depth": game.mm_depth, "rows": game.cols - 1, "cols": game.cols}, game.ms)
+        return model
+
+def run_scheduled(fn, tasks: list, configs: list, workers: int, model: CostModel=None):
+    """
+    Runs fn(*task) for every task on a pool of worker processes, longest expected first.
+
+    Tasks wait in a single queue that is re-sorted by predicted cost whenever a game finishes
+    and the model is refitted, and each worker takes the next task as soon as it is idle,
+    so no worker is left with a backlog while others sit idle.
+
+    Parameters:
+    fn (callable): Module-level function playing one task.
+    tasks (list): Argument tuples for fn.
+    configs (list): Game configuration of each task (for the cost model).
+    workers (int): Number of worker processes.
+    model (CostModel): Cost model to start from (a fresh one if None).
+
+    Yields:
+    (int, object): Index of the finished task and the value returned by fn.
+    """
+    model = model if model is not None else CostModel()
+    features = np.array([model.x(config) for config in configs])
+    pending = np.arange(len(tasks))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while len(pending) or running:
+            pending = pending[np.argsort(model.predict(features[pending]), kind="stable")]
+            while len(pending) and len(running) < workers:
+                i = int(pending[-1])    # longest expected
+                pending = pending[:-1]
+                running[pool.submit(_timed, fn, tasks[i])] = i
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = running.pop(future)
+                result, ms = future.result()
+                model.observe(configs[i], ms)
+                yield i, result
+
+def _timed(fn, task):
+    start = time.perf_counter()
+    result = fn(*task)
+    return result, (time.perf_counter() - start) * 1000
@@ -0,0 +1,98 @@
+import os
+import uuid
+import shutil
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+def category():
+    return pa.dictionary(pa.int8(), pa.string())
+
+# per-move output of run_simulation
+MOVES_SCHEMA = pa.schema([
+    ("sim_id", pa.int64()),
+    ("move_id", pa.int16()),
+    ("move", pa.int8()),        # column played, -1 if the budget was exceeded
+    ("ms", pa.float32()),
+    ("agent_curr", category()),
+    ("agent_start", category()),
+    ("mcts_strategy", category()),
+    ("n_nodes", pa.int32()),
+    ("n_pruned", pa.int32()),
+    ("n_transpositions", pa.int32()),
+    ("n_iterations", pa.int32()),
+    ("n_peak_nodes", pa.int32()),
+    ("n_reclaimed", pa.int32()),
+    ("n_ponder", pa.int64()),
+    ("mem_peak", pa.int64()),       # memory columns are null in games not sampled (see sim/memory.py)
+    ("mem_per_node", pa.float32()),
+    ("n_states", pa.int32()),
+    ("rss_growth", pa.int64()),
+    ("is_win", pa.bool_()),
+    ("depth", pa.int8()),
+    ("budget_total", pa.int32()),
+    ("budget_consumed", pa.int32()),
+    ("budget_left", pa.int32()),
+    ("budget_exceeded", pa.bool_()),
+    ("connect", pa.int8()),
+    ("bf", pa.int8()),
+])
+
+WRITE_OPTIONS = ds.ParquetFileFormat().make_write_options(compression="zstd")
+
+# directory layout of a moves dataset: <path>/budget_total=<b>/connect=<c>/part-*.parquet
+PARTITIONING = ds.partitioning(pa.schema([MOVES_SCHEMA.field("budget_total"), MOVES_SCHEMA.field("connect")]),
+                               flavor="hive")
+
+def to_table(df):
+    """
+    Per-move DataFrame as an Arrow table with the moves schema (columns it lacks, e.g. rows of
+    older runs, are null).
+    """
+    return pa.Table.from_pandas(df.reindex(columns=MOVES_SCHEMA.names), schema=MOVES_SCHEMA, preserve_index=False)
+
+def write_moves(df, path: str):
+    """
+    Appends per-move rows to the dataset at path (new files are added, existing ones are kept).
+    """
+    if len(df) == 0:
+        return
+    ds.write_dataset(to_table(df), path, format="parquet", partitioning=PARTITIONING, file_options=WRITE_OPTIONS,
+                     basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                     existing_data_behavior="overwrite_or_ignore")
+
+def remove_moves(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+def compact_moves(path: str):
+    """
+    Rewrites the dataset at path with a single file per partition, rows sorted by game and move.
+    Appending game by game leaves many small files; compacting keeps the dataset small and fast to scan.
+    """
+    if not os.path.isdir(path):
+        return
+    table = open_moves(path).to_table().sort_by([("sim_id", "ascending"), ("move_id", "ascending")])
+    tmp_path = path.rstrip("/") + ".tmp"
+    remove_moves(tmp_path)
+    ds.write_dataset(table, tmp_path, format="parquet", partitioning=PARTITIONING, file_options=WRITE_OPTIONS,
+                     basename_template="part-{i}.parquet")
+    shutil.rmtree(path)
+    os.rename(tmp_path, path)
+
+def open_moves(path: str):
+    """
+    pyarrow dataset over the moves at path.
+    Single-file tables written before the partitioned layout can still be opened.
+    """
+    if os.path.isdir(path):
+        return ds.dataset(path, schema=MOVES_SCHEMA, format="parquet", partitioning=PARTITIONING)
+    return ds.dataset(path, format="parquet")
+
+def read_moves(path: str, columns: list=None, filter: ds.Expression=None):
+    """
+    Reads the given columns of the moves at path that satisfy filter, as a DataFrame.
+    Only the requested columns are read, and partitions or row groups ruled out by filter are skipped.
+    """
+    return open_moves(path).to_table(columns=columns, filter=filter).to_pandas()
@@ -0,0 +1,139 @@
+import os
+import json
+import uuid
+import hashlib
+import pandas as pd
+from sim.schema import write_moves, remove_moves
+
+# source directories whose contents define the agents' behaviour
+CODE_DIRS = ["c4", "search"]
+# files defining how games are set up (agents, seeding) and recorded (row layout)
+CODE_FILES = ["sim/collect_data.py", "sim/schema.py"]
+
+def code_version(root: str=None):
+    """
+    Short hash of the agents' source code (every .py file under CODE_DIRS) and of CODE_FILES.
+    Any change to the code gives a new version, so old results are no longer matched.
+    """
+    root = root if root is not None else os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    for code_dir in CODE_DIRS:
+        for dir_path, dir_names, file_names in sorted(os.walk(os.path.join(root, code_dir))):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                if file_name.endswith(".py"):
+                    digest.update(file_name.encode())
+                    with open(os.path.join(dir_path, file_name), "rb") as f:
+                        digest.update(f.read())
+    for file_name in CODE_FILES:
+        digest.update(file_name.encode())
+        with open(os.path.join(root, file_name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+class ExperimentStore(object):
+    """
+    Game results keyed by a hash of each game's full configuration
+    (budget, strategy, depth, is_mm_p1, board shape, seed, ...) and the code version.
+
+    Games are kept as parquet shards under root, with two extra columns:
+    config_hash and code_version. Shards are only ever added; invalidate rewrites them
+    without the results of other code versions.
+    """
+
+    def __init__(self,
+                 root: str="bin/store",
+                 version: str=None,
+                 flush_every: int=100
+                 ):
+        self.root = root
+        self.version = version if version is not None else code_version()
+        self.flush_every = flush_every  # games buffered before writing a new shard
+        self.buffer = []
+
+        os.makedirs(root, exist_ok=True)
+        self.done = set()
+        for shard in self.shards():
+            hashes = pd.read_parquet(shard, columns=["config_hash"])["config_hash"]
+            self.done.update(hashes.unique())
+
+    def shards(self):
+        return sorted(os.path.join(self.root, f) for f in os.listdir(self.root) if f.endswith(".parquet"))
+
+    def key(self, config: dict):
+        """
+        Hash of a configuration under the current code version.
+        """
+        payload = json.dumps({**config, "code_version": self.version}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def sim_id(self, config: dict):
+        """
+        Stable integer id of a game, derived from its hash.
+        """
+        return int(self.key(config)[:15], 16)
+
+    def contains(self, config: dict):
+        return self.key(config) in self.done
+
+    def add(self, config: dict, game: pd.DataFrame):
+        """
+        Buffers the per-move rows of a finished game.
+        """
+        game = game.assign(config_hash=self.key(config), code_version=self.version)
+        self.buffer.append(game)
+        self.done.add(self.key(config))
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        shard = os.path.join(self.root, f"shard_{uuid.uuid4().hex}.parquet")
+        pd.concat(self.buffer, ignore_index=True).to_parquet(shard, index=False)
+        self.buffer = []
+
+    def load(self, configs: list=None):
+        """
+        Stored rows of the given configurations (every game of the current version if None).
+        """
+        self.flush()
+        hashes = set(self.key(config) for config in configs) if configs is not None else None
+        frames = []
+        for shard in self.shards():
+            df = pd.read_parquet(shard)
+            df = df[df["code_version"] == self.version]
+            if hashes is not None:
+                df = df[df["config_hash"].isin(hashes)]
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def export(self, configs: list, file_name: str):
+        """
+        Writes the rows of the given configurations to the moves dataset file_name (replaced), 
+        in the per-move layout of run_simulation.
+        """
+        df = self.load(configs).drop(columns=["config_hash", "code_version"], errors="ignore")
+        remove_moves(file_name)
+        write_moves(df, file_name)
+
+    def invalidate(self, keep_current: bool=True):
+        """
+        Deletes results of other code versions (or everything if keep_current is False).
+        """
+        self.flush()
+        for shard in self.shards():
+            df = pd.read_parquet(shard)
+            kept = df[df["code_version"] == self.version] if keep_current else df.iloc[0:0]
+            if len(kept) == len(df):
+                continue
+            if len(kept) == 0:
+                os.remove(shard)
+            else:
+                kept.to_parquet(shard, index=False)
+        self.done = set()
+        if keep_current:
+            for shard in self.shards():
+                self.done.update(pd.read_parquet(shard, columns=["config_hash"])["config_hash"].unique())
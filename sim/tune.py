@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from itertools import product
+from sim.arena import game_score, play_games
+from sim.scheduler import CostModel
+from sim.schema import write_moves, remove_moves, compact_moves
+
+def tune_depth(budget: int,
+               shape: tuple,
+               depths: list,
+               strats: list,
+               base_seed: int=42,
+               games: int=2,
+               eta: int=2,
+               workers: int=1,
+               file_name: str=None,
+               first_sim_id: int=0
+               ):
+    """
+    Best Minimax depth against MCTS at a budget on a board, by successive halving.
+
+    Every round, each remaining depth plays games per MCTS strategy and colour (Minimax first or second);
+    the depths with the best Minimax score over all their games so far (1/eta of them, ties to the
+    shallower depth) go on to the next round, which plays eta times as many games.
+    Rounds go on until a single depth is left.
+
+    Parameters:
+    budget (int): Budget of both agents.
+    shape (tuple): Board rows, cols and connect.
+    depths (list): Candidate depths.
+    strats (list): MCTS strategies played against (all of them, evenly).
+    games (int): Games per strategy and colour in the first round.
+    eta (int): Fraction of depths kept and growth of the games every round (at least 2).
+    file_name (str): Moves dataset the games are appended to (not kept if None).
+    first_sim_id (int): Sim id of the first game (games are seeded with base_seed + sim id).
+
+    Returns:
+    (pd.DataFrame): One row per depth: games, wins, draws, losses, score and the round it was eliminated in
+                    (-1 for the best one), best first.
+    """
+    if eta < 2:
+        raise ValueError(f"eta must be at least 2 (1/eta of the depths are kept every round), got {eta}.")
+
+    rows, cols, connect = shape
+    counts = {depth: np.zeros(3, dtype=np.int64) for depth in depths}  # Minimax wins, draws, losses
+    eliminated = {}
+    alive = list(depths)
+    model = CostModel()
+    sim_id = first_sim_id
+    n = games
+    round_id = 0
+
+    while len(alive) > 1:
+        configs = [{"budget": budget, "mcts_strat": strat, "mm_depth": depth, "is_mm_p1": is_mm_p1,
+                    "rows": rows, "cols": cols, "connect": connect}
+                   for depth, strat, is_mm_p1, _ in product(alive, strats, [True, False], range(n))]
+        sim_ids = list(range(sim_id, sim_id + len(configs)))
+        sim_id += len(configs)
+
+        played = play_games(configs, sim_ids, base_seed, workers, model)
+        if file_name is not None:
+            write_moves(pd.concat(played, ignore_index=True), file_name)
+        for config, game in zip(configs, played):
+            counts[config["mm_depth"]][{1.0: 0, 0.5: 1, 0.0: 2}[game_score(game)]] += 1
+
+        ranked = sorted(alive, key=lambda depth: (-_score(counts[depth]), depth))
+        kept = ranked[:max(1, int(np.ceil(len(alive) / eta)))]
+        for depth in ranked[len(kept):]:
+            eliminated[depth] = round_id
+        alive = kept
+        n *= eta
+        round_id += 1
+
+    # best first: the last depth standing, then the depths eliminated last, by score
+    order = sorted(depths, key=lambda depth: (-eliminated.get(depth, round_id), -_score(counts[depth])))
+    results = pd.DataFrame({"depth": order})
+    results["wins"], results["draws"], results["losses"] = np.array([counts[depth] for depth in order]).T
+    results["games"] = results[["wins", "draws", "losses"]].sum(axis=1)
+    results["score"] = [_score(counts[depth]) for depth in order]
+    results["eliminated"] = [eliminated.get(depth, -1) for depth in order]
+    return results
+
+def tune_table(budgets: list,
+               shapes: list,
+               depths: list,
+               strats: list,
+               base_seed: int=42,
+               games: int=2,
+               eta: int=2,
+               workers: int=1,
+               file_name: str=None
+               ):
+    """
+    Best depth of every budget and board shape (see tune_depth), as a table with the games it took.
+    With file_name, the games of every tuning run are kept in that moves dataset (replaced).
+    """
+    if eta < 2:
+        raise ValueError(f"eta must be at least 2 (1/eta of the depths are kept every round), got {eta}.")
+    if file_name is not None:
+        remove_moves(file_name)
+
+    rows = []
+    sim_id = 0
+    for budget, shape in product(budgets, shapes):
+        results = tune_depth(budget, shape, depths, strats, base_seed, games, eta, workers, file_name, sim_id)
+        sim_id += int(results["games"].sum())
+        best = results.iloc[0]
+        rows.append({"budget": budget, "rows": shape[0], "cols": shape[1], "connect": shape[2],
+                     "best_depth": int(best["depth"]), "score": best["score"], "games": int(results["games"].sum())})
+
+    if file_name is not None:
+        compact_moves(file_name)
+
+    return pd.DataFrame(rows)
+
+def _score(counts: np.array):
+    # Minimax score (draws count half), 0 before any game
+    return (counts[0] + counts[1] / 2) / counts.sum() if counts.sum() else 0.0